@@ -0,0 +1,31 @@
+"""add posts created_at id index
+
+Revision ID: 4f1ec33fd161
+Revises: 6c10fafb66dd
+Create Date: 2026-10-18 10:12:41.220913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1ec33fd161'
+down_revision = '6c10fafb66dd'
+branch_labels = None
+depends_on = None
+
+
+# Keyset pagination of the posts list (ORDER BY created_at DESC, id DESC).
+# CONCURRENTLY can't run inside a transaction, hence the autocommit block.
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_created_at_id "
+            "ON posts (created_at, id)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_created_at_id")
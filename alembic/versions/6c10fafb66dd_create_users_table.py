@@ -17,12 +17,45 @@ depends_on = None
 
 
 def upgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    # IF NOT EXISTS: `app.schemas` (imported by env.py) creates missing tables
+    # with the current model, so a fresh database may already have them
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id SERIAL PRIMARY KEY,
+            email VARCHAR NOT NULL UNIQUE,
+            password VARCHAR NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NULL
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS posts (
+            id SERIAL PRIMARY KEY,
+            title VARCHAR NOT NULL,
+            content VARCHAR NOT NULL,
+            published BOOLEAN DEFAULT TRUE NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NULL,
+            owner_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS votes (
+            post_id INTEGER REFERENCES posts (id) ON DELETE CASCADE,
+            user_id INTEGER REFERENCES users (id) ON DELETE CASCADE,
+            liked_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+            PRIMARY KEY (post_id, user_id)
+        )
+        """
+    )
 
 
 def downgrade() -> None:
-    # ### commands auto generated by Alembic - please adjust! ###
-    pass
-    # ### end Alembic commands ###
+    op.drop_table('votes')
+    op.drop_table('posts')
+    op.drop_table('users')
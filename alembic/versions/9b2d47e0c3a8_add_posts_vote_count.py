@@ -0,0 +1,37 @@
+"""add posts vote_count
+
+Revision ID: 9b2d47e0c3a8
+Revises: 4f1ec33fd161
+Create Date: 2026-10-18 11:03:27.581046
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b2d47e0c3a8'
+down_revision = '4f1ec33fd161'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # IF NOT EXISTS: `app.schemas` (imported by env.py) creates missing tables
+    # with the current model, so a fresh database already has the column
+    op.execute(
+        "ALTER TABLE posts "
+        "ADD COLUMN IF NOT EXISTS vote_count INTEGER DEFAULT 0 NOT NULL"
+    )
+    # Backfill, same as `python -m app.Utils.reconcile_vote_counts`
+    op.execute(
+        """
+        UPDATE posts SET vote_count = counts.votes
+        FROM (SELECT post_id, count(*) AS votes FROM votes GROUP BY post_id) AS counts
+        WHERE posts.id = counts.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'vote_count')
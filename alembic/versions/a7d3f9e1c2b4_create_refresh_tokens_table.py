@@ -0,0 +1,39 @@
+"""create refresh tokens table
+
+Revision ID: a7d3f9e1c2b4
+Revises: e03b6a1d7f52
+Create Date: 2026-10-18 16:20:41.115902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3f9e1c2b4'
+down_revision = 'e03b6a1d7f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # `app.schemas` (imported by env.py) creates missing tables with the current
+    # model, so a fresh database already has it
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS refresh_tokens (
+            token_hash VARCHAR(64) PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_user_id "
+        "ON refresh_tokens (user_id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('refresh_tokens')
@@ -0,0 +1,53 @@
+"""add posts search indexes
+
+Revision ID: c5e81f2a9d64
+Revises: 9b2d47e0c3a8
+Create Date: 2026-10-18 12:26:09.114532
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e81f2a9d64'
+down_revision = '9b2d47e0c3a8'
+branch_labels = None
+depends_on = None
+
+
+# Full text search: generated tsvector column + GIN index (mode=fulltext)
+# Substring search: pg_trgm GIN indexes on title and content (mode=substring and
+# the default title search)
+#
+# Adding a stored generated column rewrites the posts table, run it off-peak.
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # IF NOT EXISTS: `app.schemas` (imported by env.py) creates missing tables
+    # with the current model, so a fresh database already has the column
+    op.execute(
+        "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector TSVECTOR "
+        "GENERATED ALWAYS AS (to_tsvector('english', title || ' ' || content)) STORED"
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_search_vector "
+            "ON posts USING gin (search_vector)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_title_trgm "
+            "ON posts USING gin (title gin_trgm_ops)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_content_trgm "
+            "ON posts USING gin (content gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_content_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_title_trgm")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_search_vector")
+    op.drop_column('posts', 'search_vector')
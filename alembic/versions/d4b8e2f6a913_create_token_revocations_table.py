@@ -0,0 +1,41 @@
+"""create token revocations table
+
+Revision ID: d4b8e2f6a913
+Revises: a7d3f9e1c2b4
+Create Date: 2026-10-18 17:05:12.640381
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2f6a913'
+down_revision = 'a7d3f9e1c2b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # `app.schemas` (imported by env.py) creates missing tables with the current
+    # model, so a fresh database already has it
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS token_revocations (
+            id SERIAL PRIMARY KEY,
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            jti VARCHAR,
+            revoked_before TIMESTAMP WITH TIME ZONE,
+            expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_token_revocations_expires_at "
+        "ON token_revocations (expires_at)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('token_revocations')
@@ -0,0 +1,38 @@
+"""add hot path indexes
+
+Revision ID: e03b6a1d7f52
+Revises: c5e81f2a9d64
+Create Date: 2026-10-18 13:41:55.802317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e03b6a1d7f52'
+down_revision = 'c5e81f2a9d64'
+branch_labels = None
+depends_on = None
+
+# Foreign keys postgres doesn't index on its own. votes.post_id lookups are
+# served by the (post_id, user_id) primary key, posts.created_at by
+# ix_posts_created_at_id.
+INDEXES = {
+    "ix_posts_owner_id": "posts (owner_id)",
+    "ix_votes_user_id": "votes (user_id)",
+}
+
+
+# CONCURRENTLY doesn't block writes while building but can't run inside a
+# transaction, hence the autocommit block.
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {columns}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
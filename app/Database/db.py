@@ -9,9 +9,11 @@ Database functions
 import fastapi
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 
 from app.settings import settings
+from app.Database.pool import InstrumentedAsyncPool, InstrumentedQueuePool
 
 # App Settings
 settings = settings.Settings()
@@ -23,12 +25,50 @@ HOST = settings.POSTGRES_HOST
 DATABASE = settings.DATABASE
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{USER}:{PASS}@{HOST}/{DATABASE}"
+SQLALCHEMY_ASYNC_DATABASE_URL = f"postgresql+asyncpg://{USER}:{PASS}@{HOST}/{DATABASE}"
+
+# Connection pool configuration
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
 
 # Set up database
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS
+)
 session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 base = declarative_base()
 
+# Set up async database (asyncpg)
+# expire_on_commit=False: attributes can't be lazily refreshed outside of an
+# awaitable context, so objects must stay usable after commit.
+async_engine = create_async_engine(
+    SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=InstrumentedAsyncPool, **POOL_OPTIONS
+)
+async_session_local = sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+def pool_metrics() -> dict:
+    """
+    Connection pool metrics of every engine
+
+    Returns:
+        dict: Pool metrics by engine name
+    """
+    return {
+        "primary": async_engine.pool.metrics.snapshot(async_engine.pool),
+        "primary_sync": engine.pool.metrics.snapshot(engine.pool),
+    }
+
 
 def connect_to_postgres_db():
     """
@@ -50,3 +90,25 @@ def connect_to_postgres_db():
 
     finally:
         database.close()
+
+
+async def connect_to_async_postgres_db():
+    """
+    Create async postgres session
+
+    Yields:
+        sqlalchemy.ext.asyncio.AsyncSession: Async Postgres Session Object
+    """
+    database = async_session_local()
+    try:
+        yield database
+
+    except fastapi.exceptions.HTTPException as error:
+        print("Something went wrong while performing DB operation")
+        print("MSG ==>", error)
+
+    except Exception as error:
+        print("Error occured ==>", error)
+
+    finally:
+        await database.close()
@@ -0,0 +1,111 @@
+# pylint: disable=E0401, E0611, R0903, W0212
+
+"""
+Instrumented connection pools
+
+Same behaviour as SQLAlchemy's QueuePool / AsyncAdaptedQueuePool, plus counters
+for checkout wait time, checkout timeouts, in-use and overflow connections so the
+pool can be sized against postgres `max_connections` from data.
+"""
+
+# Imports
+import time
+import threading
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (ms) of the checkout wait histogram buckets, last one is open
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+
+class PoolMetrics:
+    """Checkout counters of a single pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def record_checkout(self, wait: float):
+        """Record a successful checkout which waited `wait` seconds"""
+        wait_ms = wait * 1000
+        bucket = next(
+            (i for i, bound in enumerate(WAIT_BUCKETS_MS) if wait_ms <= bound),
+            len(WAIT_BUCKETS_MS),
+        )
+
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.wait_buckets[bucket] += 1
+
+    def record_timeout(self):
+        """Record a checkout that gave up after `pool_timeout`"""
+        with self._lock:
+            self.checkout_timeouts += 1
+
+    def snapshot(self, pool) -> dict:
+        """
+        Current pool state along with the collected counters
+
+        Args:
+            pool (QueuePool): Pool these metrics belong to
+
+        Returns:
+            dict: Pool metrics
+        """
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+                "checked_in": pool.checkedin(),
+                "in_use": pool.checkedout(),
+                # QueuePool counts overflow from -pool_size upwards
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": checkouts,
+                "checkout_timeouts": self.checkout_timeouts,
+                "wait_avg_ms": (self.total_wait / checkouts * 1000) if checkouts else 0,
+                "wait_max_ms": self.max_wait * 1000,
+                "wait_histogram_ms": {
+                    **{
+                        f"<={bound}": count
+                        for bound, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)
+                    },
+                    f">{WAIT_BUCKETS_MS[-1]}": self.wait_buckets[-1],
+                },
+            }
+
+
+class InstrumentedPoolMixin:
+    """Time every checkout of a queue pool"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+
+        except exc.TimeoutError:
+            self.metrics.record_timeout()
+            raise
+
+        self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    """QueuePool with checkout metrics (psycopg2 engine)"""
+
+
+class InstrumentedAsyncPool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout metrics (asyncpg engine)"""
@@ -0,0 +1,74 @@
+# pylint: disable=E0401, R0903, W0613
+
+"""
+Per-request SQL statement counter
+
+Every statement sent by any engine (sync or async) is counted against the request
+being served, so N+1 query patterns show up as a growing count. The count is sent
+back in the X-SQL-Statements header when SQL_STATEMENT_COUNT_HEADER is enabled.
+"""
+
+# Imports
+from typing import Optional
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.settings import settings
+
+# App Settings
+settings = settings.Settings()
+
+HEADER = b"x-sql-statements"
+
+
+class StatementCount:
+    """Number of statements executed while serving a request"""
+
+    def __init__(self):
+        self.statements = 0
+
+
+# Counter of the request being served (threadpool and greenlet calls inherit it)
+current_count: ContextVar[Optional[StatementCount]] = ContextVar(
+    "current_count", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def count_statement(conn, cursor, statement, parameters, context, executemany):
+    """Count the statement against the current request"""
+    count = current_count.get()
+    if count is not None:
+        count.statements += 1
+
+
+class StatementCountMiddleware:
+    """ASGI middleware counting the SQL statements of every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        count = StatementCount()
+        token = current_count.set(count)
+
+        async def send_with_count(message):
+            if (
+                message["type"] == "http.response.start"
+                and settings.SQL_STATEMENT_COUNT_HEADER
+            ):
+                headers = list(message.get("headers", []))
+                headers.append((HEADER, str(count.statements).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count)
+        finally:
+            current_count.reset(token)
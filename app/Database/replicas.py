@@ -0,0 +1,293 @@
+# pylint: disable=E0401, E0611, W0703
+
+"""
+Read replica routing
+
+Reads are spread round-robin over the configured replicas. A replica that fails
+its connection check is skipped for `REPLICA_HEALTH_CHECK_INTERVAL` seconds, and
+reads fall back to the primary when no replica is usable.
+
+Read-your-writes: after a user writes, that user's reads go to the primary for
+`READ_YOUR_WRITES_WINDOW` seconds so they don't see replication lag. The write
+is recorded in the worker process and sent back in a short-lived cookie
+("user_id:epoch seconds"), so the user's next requests stick to the primary
+whichever worker serves them.
+"""
+
+# Imports
+import math
+import time
+import itertools
+from http.cookies import CookieError, SimpleCookie
+from typing import Optional
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.Database import db
+from app.Database.pool import InstrumentedAsyncPool
+from app.Utils import oauth2
+from app.settings import settings
+
+# App Settings
+settings = settings.Settings()
+
+# Prune the write log once it holds this many users
+MAX_TRACKED_WRITERS = 10_000
+
+# Cookie carrying the user's last write to every worker
+WRITE_COOKIE = "last_write"
+
+
+class RequestWrites:
+    """Last write the client reported (cookie), and the users written for"""
+
+    def __init__(self, cookie: Optional[str]):
+        self.user_id: Optional[int] = None
+        self.written_at = 0.0
+        self.writers: list[int] = []
+
+        try:
+            user_id, written_at = cookie.split(":")
+            self.user_id, self.written_at = int(user_id), float(written_at)
+        except (AttributeError, ValueError):
+            pass  # no cookie, or not one of ours
+
+
+# Writes of the request being served
+current_writes: ContextVar[Optional[RequestWrites]] = ContextVar(
+    "current_writes", default=None
+)
+
+
+class Replica:
+    """A read replica engine and its health state"""
+
+    def __init__(self, name: str, url: str, **engine_options):
+        self.name = name
+        self.engine = create_async_engine(
+            make_url(url).set(drivername="postgresql+asyncpg"), **engine_options
+        )
+        self.session_local = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+            info={"replica": True},  # posts_model.fills_cache
+        )
+        self.healthy = True
+        self.retry_at = 0.0
+
+    def usable(self, now: float) -> bool:
+        """Healthy, or unhealthy long enough to be checked again"""
+        return self.healthy or now >= self.retry_at
+
+
+class ReplicaRouter:
+    """Pick the database a read should go to"""
+
+    def __init__(
+        self,
+        urls: list[str],
+        health_check_interval: float,
+        read_your_writes_window: float,
+        **engine_options,
+    ):
+        self.health_check_interval = health_check_interval
+        self.read_your_writes_window = read_your_writes_window
+        self.set_replicas(urls, **engine_options)
+
+    def set_replicas(self, urls: list[str], **engine_options):
+        """(Re)configure the replicas, this also forgets every recorded write"""
+        self.replicas = [
+            Replica(f"replica_{index}", url, **engine_options)
+            for index, url in enumerate(urls)
+        ]
+        self._round_robin = itertools.cycle(self.replicas)
+        self._writes: dict[int, float] = {}
+
+    # ----------------------------- Read-your-writes ----------------------------- #
+    def record_write(self, user_id: int):
+        """Pin the user's reads to the primary for the read-your-writes window, in
+        this worker and (through the cookie) in the others"""
+        writes = current_writes.get()
+        if writes is not None:
+            writes.writers.append(user_id)
+
+        now = time.monotonic()
+
+        if len(self._writes) >= MAX_TRACKED_WRITERS:
+            self._writes = {
+                user: until for user, until in self._writes.items() if until > now
+            }
+
+        self._writes[user_id] = now + self.read_your_writes_window
+
+    def wrote_recently(self, user_id: Optional[int]) -> bool:
+        """Did the user write within the read-your-writes window (on any worker)?"""
+        if self._writes.get(user_id, 0) > time.monotonic():
+            return True
+
+        writes = current_writes.get()
+        return (
+            writes is not None
+            and user_id is not None
+            and writes.user_id == user_id
+            and time.time() - writes.written_at < self.read_your_writes_window
+        )
+
+    # --------------------------------- Replicas --------------------------------- #
+    def candidates(self) -> list[Replica]:
+        """Usable replicas in round-robin order"""
+        now = time.monotonic()
+        ordered = [next(self._round_robin) for _ in self.replicas]
+        return [replica for replica in ordered if replica.usable(now)]
+
+    def mark_unhealthy(self, replica: Replica, error: Exception):
+        """Skip the replica until the next health check"""
+        print(f"Replica {replica.name} failed its health check ==>", error)
+        replica.healthy = False
+        replica.retry_at = time.monotonic() + self.health_check_interval
+
+    @asynccontextmanager
+    async def session(self, user_id: Optional[int], primary: AsyncSession):
+        """
+        Session to run a read on
+
+        Args:
+            user_id (int, Optional): Id of the reading user (for read-your-writes)
+            primary (AsyncSession): Primary session to fall back to
+
+        Yields:
+            AsyncSession: Replica session, or the primary one
+        """
+        if self.replicas and not self.wrote_recently(user_id):
+            for replica in self.candidates():
+                database = replica.session_local()
+                try:
+                    # Health check: check a connection out before handing it over
+                    connection = await database.connection()
+                    if not replica.healthy:
+                        await connection.execute(text("SELECT 1"))
+                        replica.healthy = True
+
+                except Exception as error:
+                    await database.close()
+                    self.mark_unhealthy(replica, error)
+                    continue
+
+                try:
+                    yield database
+                finally:
+                    await database.close()
+                return
+
+        yield primary
+
+    def pool_metrics(self) -> dict:
+        """Connection pool metrics of every replica"""
+        return {
+            replica.name: {
+                "healthy": replica.healthy,
+                **replica.engine.pool.metrics.snapshot(replica.engine.pool),
+            }
+            for replica in self.replicas
+            if hasattr(replica.engine.pool, "metrics")
+        }
+
+
+replica_router = ReplicaRouter(
+    settings.POSTGRES_REPLICA_URLS,
+    settings.REPLICA_HEALTH_CHECK_INTERVAL,
+    settings.READ_YOUR_WRITES_WINDOW,
+    poolclass=InstrumentedAsyncPool,
+    **{**db.POOL_OPTIONS, "pool_pre_ping": True},
+)
+
+
+# ---------------------------------------------------------------------------- #
+#                                  Middleware                                  #
+# ---------------------------------------------------------------------------- #
+
+
+def write_cookie(scope) -> Optional[str]:
+    """Value of the write cookie sent with the request"""
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            try:
+                cookie = SimpleCookie(value.decode("latin-1"))
+            except CookieError:
+                return None
+            return cookie[WRITE_COOKIE].value if WRITE_COOKIE in cookie else None
+    return None
+
+
+class ReadYourWritesMiddleware:
+    """ASGI middleware reading the write cookie of every HTTP request, and setting
+    it on responses to writes"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        writes = RequestWrites(write_cookie(scope))
+        token = current_writes.set(writes)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and writes.writers:
+                cookie = (
+                    f"{WRITE_COOKIE}={writes.writers[-1]}:{time.time():.3f}; "
+                    f"Max-Age={math.ceil(replica_router.read_your_writes_window)}; "
+                    "Path=/api; HttpOnly; SameSite=Lax"
+                )
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            current_writes.reset(token)
+
+
+# ---------------------------------------------------------------------------- #
+#                                 Dependencies                                 #
+# ---------------------------------------------------------------------------- #
+
+
+async def connect_to_read_db(
+    current_user=Depends(oauth2.get_current_user),
+    primary: AsyncSession = Depends(db.connect_to_async_postgres_db),
+):
+    """
+    Read-only session for the logged in user
+
+    Yields:
+        AsyncSession: Replica session, or the primary one right after the user wrote
+    """
+    async with replica_router.session(current_user.id, primary) as database:
+        yield database
+
+
+async def connect_to_user_read_db(
+    user_id: int,
+    primary: AsyncSession = Depends(db.connect_to_async_postgres_db),
+):
+    """
+    Read-only session to fetch the user with given user_id
+
+    Yields:
+        AsyncSession: Replica session, or the primary one right after the user changed
+    """
+    async with replica_router.session(user_id, primary) as database:
+        yield database
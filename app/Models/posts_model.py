@@ -4,87 +4,748 @@
 Database operations for Posts
 """
 
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 from fastapi import HTTPException, status
 
-from sqlalchemy import func
-from sqlalchemy.orm import Session
+from sqlalchemy import (
+    Boolean,
+    Integer,
+    String,
+    any_,
+    bindparam,
+    cast,
+    delete,
+    func,
+    insert,
+    literal,
+    literal_column,
+    or_,
+    select,
+    true,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.Models.users_model import User
-from app.schemas.posts_schema import Post
+from app.schemas.posts_schema import Post, PostResponse, PostSummary, SearchMode
 from app.schemas.votes_schema import Vote
+from app.settings import settings
+from app.Utils.cache import MISSING, TTLCache
 
 # from app.Models.votes_model import Vote
 
+# App Settings
+settings = settings.Settings()
+
+# Text search configuration, must match the posts.search_vector expression
+FULLTEXT_CONFIG = literal_column("'english'::regconfig")
+
+# Serialized post reads, keyed by query params (per worker process)
+posts_cache = TTLCache(settings.POSTS_CACHE_TTL, settings.POSTS_CACHE_MAX_BYTES)
+
+# Columns a posts list can be narrowed down to (GET /api/posts/?fields=...)
+POST_FIELDS = {
+    "id": Post.id,
+    "title": Post.title,
+    "content": Post.content,
+    "excerpt": func.left(Post.content, settings.POSTS_EXCERPT_LENGTH),
+    "published": Post.published,
+    "created_at": Post.created_at,
+    "updated_at": Post.updated_at,
+    "owner_id": Post.owner_id,
+    "owner_email": User.email,
+    "votes": Post.vote_count,
+}
+SUMMARY_FIELDS = tuple(PostSummary.__fields__)
+# Columns bulk writes return (everything PostData needs but the owner)
+RETURNED_COLUMNS = (
+    Post.id,
+    Post.title,
+    Post.content,
+    Post.published,
+    Post.owner_id,
+    Post.created_at,
+    Post.updated_at,
+)
+EXPORT_FIELDS = tuple(name for name in POST_FIELDS if name != "excerpt")
+
 # ---------------------------------------------------------------------------- #
 #                                Helper Functions                              #
 # ---------------------------------------------------------------------------- #
-def check_if_post_exists(database: Session, post_id: int):
-    """Check if post with given post_id exists"""
-    return database.query(Post).filter(Post.id == post_id).first()
+async def raise_not_owned_or_missing(database: AsyncSession, post_id: int):
+    """
+    Explain why a write guarded by owner_id matched no post
+
+    Raises:
+        HTTPException: HTTP_403_FORBIDDEN [post of someone else]
+        HTTPException: HTTP_404_NOT_FOUND
+    """
+    result = await database.execute(post_id_query(post_id))
+
+    if result.scalar() is not None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to perform requested operation",
+        )
+
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found!")
+
+
+async def get_post_with_owner(database: AsyncSession, post_id: int):
+    """Load (or reload) a post along with its owner"""
+    result = await database.execute(
+        post_query(post_id)
+        .options(joinedload(Post.owner, innerjoin=True))
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+def serialize_post(row) -> Dict:
+    """Cacheable (Post, votes) response data of a result row"""
+    return PostResponse(Post=row.Post, votes=row.votes).dict()
+
+
+def sort_key_of(row) -> tuple:
+    """Paging key of a posts list row, (rank, id) for full text search, else
+    (created_at, id)"""
+    post = row.Post if "Post" in row.keys() else row
+    if "rank" in row.keys():
+        return row.rank, post.id
+    return post.created_at, post.id
+
+
+def post_id_of(post: Dict) -> int:
+    """Id of a serialized post, full or narrowed down to some fields"""
+    return post["Post"]["id"] if "Post" in post else post["id"]
 
 
 # ---------------------------------------------------------------------------- #
-#                                 DB Operations                                #
+#                                 Cache Helpers                                #
 # ---------------------------------------------------------------------------- #
+# Entries are keyed ("post", post_id) or ("list", limit, skip, search, after,
+# mode, fields), list entries are tagged with the ids of the posts they hold.
+
 
+def fills_cache(database: AsyncSession) -> bool:
+    """May rows read on this session go in the cache? Replicas may not have caught
+    up with the writes the cache was just invalidated for, only the primary's rows
+    are cached"""
+    return not database.info.get("replica", False)
 
-def get_all_posts(database: Session, limit: int, skip: int, search: str) -> List[Dict]:
+
+def is_list_key(key: tuple) -> bool:
+    """Is this a posts list entry?"""
+    return key[0] == "list"
+
+
+def invalidate_created_post():
+    """A new post may show up on any list page"""
+    posts_cache.invalidate_where(is_list_key)
+
+
+def invalidate_updated_post(post_id: int):
     """
-    Fetch list of all posts
+    Drop entries holding the post, and search results the new content may match
 
     Args:
-        database (Session): Database session
-        limit (int): Number of posts to return
-        skip (int): Number of posts to skip
-        search (str): Search query string
+        post_id (int): Id of the updated post
+    """
+    posts_cache.invalidate(("post", post_id))
+    posts_cache.invalidate_tag(post_id)
+    posts_cache.invalidate_where(lambda key: is_list_key(key) and bool(key[3]))
+
+
+def invalidate_deleted_post(post_id: int):
+    """
+    Drop entries holding the post, and offset pages the deletion shifts
+
+    Args:
+        post_id (int): Id of the deleted post
+    """
+    posts_cache.invalidate(("post", post_id))
+    posts_cache.invalidate_tag(post_id)
+    posts_cache.invalidate_where(
+        lambda key: is_list_key(key) and key[4] is None and key[2] > 0
+    )
+
+
+def invalidate_voted_post(post_id: int):
+    """
+    Drop entries showing the vote count of the post
+
+    Args:
+        post_id (int): Id of the voted post
+    """
+    posts_cache.invalidate(("post", post_id))
+    posts_cache.invalidate_tag(post_id)
+
+
+# ---------------------------------------------------------------------------- #
+#                                    Queries                                   #
+# ---------------------------------------------------------------------------- #
+# Statements are built separately from their execution so the same query can be
+# run by both sync and async sessions (see benchmarks/posts_list.py).
+
+
+def post_query(post_id: int):
+    """Query for the post with given post_id"""
+    return select(Post).where(Post.id == post_id)
+
+
+def post_id_query(post_id: int):
+    """Query for the id of the post with given post_id (existence check)"""
+    return select(Post.id).where(Post.id == post_id)
+
+
+def update_post_query(post_id: int, owner_id: int, values: Dict):
+    """
+    Query to update a post, only if it belongs to the user
+
+    Args:
+        post_id (int): Id of the post
+        owner_id (int): Id of the user updating it
+        values (Dict): New column values
 
     Returns:
-        list: Return list of posts
+        sqlalchemy.sql.Update: update statement returning RETURNED_COLUMNS
+            (no row when the post doesn't exist or belongs to someone else)
     """
     return (
-        database.query(Post, func.count(Vote.post_id).label("votes"))
+        update(Post)
+        .where(Post.id == post_id, Post.owner_id == owner_id)
+        .values(**values, updated_at=func.now())
+        .returning(*RETURNED_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def delete_post_query(post_id: int, owner_id: int):
+    """
+    Query to delete a post, only if it belongs to the user
+
+    Args:
+        post_id (int): Id of the post
+        owner_id (int): Id of the user deleting it
+
+    Returns:
+        sqlalchemy.sql.Delete: delete statement returning the post id
+            (no row when the post doesn't exist or belongs to someone else)
+    """
+    return (
+        delete(Post)
+        .where(Post.id == post_id, Post.owner_id == owner_id)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def posts_with_votes_query():
+    """
+    Base query for posts along with their vote count and owner
+
+    The owner is joined in, so a page of posts is a single statement.
+
+    Returns:
+        sqlalchemy.sql.Select: (Post, votes) select statement
+    """
+    return select(Post, Post.vote_count.label("votes")).options(
+        joinedload(Post.owner, innerjoin=True)
+    )
+
+
+def single_post_query(post_id: int):
+    """Query for the post with given post_id along with its vote count and owner"""
+    return posts_with_votes_query().where(Post.id == post_id)
+
+
+def posts_fields_query(fields: Tuple[str, ...]):
+    """
+    Base query for posts narrowed down to some columns (see POST_FIELDS)
+
+    Args:
+        fields (Tuple[str, ...]): Names of the columns to select, id and created_at
+            (the paging key) are always selected
+
+    Returns:
+        sqlalchemy.sql.Select: select statement of the labeled columns
+    """
+    names = dict.fromkeys(("id", "created_at", *fields))
+    query = select(*(POST_FIELDS[name].label(name) for name in names))
+
+    if "owner_email" in names:
+        query = query.join_from(Post, User, Post.owner_id == User.id)
+    return query
+
+
+def posts_by_ids_query(post_ids: List[int]):
+    """
+    Query for the posts with given ids along with their vote count and owner
+
+    The ids are bound as a single array (`id = ANY(:post_ids)`), so the statement
+    is the same whatever the number of ids.
+
+    Args:
+        post_ids (List[int]): Ids of the posts
+
+    Returns:
+        sqlalchemy.sql.Select: (Post, votes) select statement
+    """
+    ids = bindparam("post_ids", post_ids, type_=ARRAY(Integer))
+    return posts_with_votes_query().where(Post.id == any_(ids))
+
+
+def vote_count_query(post_id: int, change: int):
+    """
+    Query to add `change` to the vote count of a post
+
+    Args:
+        post_id (int): Id of the voted post
+        change (int): +1 for a new vote, -1 for a removed one
+
+    Returns:
+        sqlalchemy.sql.Update: update statement
+    """
+    return (
+        update(Post)
+        .where(Post.id == post_id)
+        .values(vote_count=Post.vote_count + change)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reconcile_vote_counts_query():
+    """
+    Query to repair vote counts which drifted from the "votes" table
+
+    Returns:
+        sqlalchemy.sql.Update: update statement returning ids of repaired posts
+    """
+    counts = (
+        select(Post.id, func.count(Vote.post_id).label("votes"))
         .join(Vote, Post.id == Vote.post_id, isouter=True)
         .group_by(Post.id)
-        .filter(Post.title.contains(search))
+        .subquery()
+    )
+    return (
+        update(Post)
+        .where(Post.id == counts.c.id, Post.vote_count != counts.c.votes)
+        .values(vote_count=counts.c.votes)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bulk_posts_rows(with_ids: bool = False):
+    """
+    Rows of the posts sent to a bulk write, unnested from one array per column
+
+    Binding one array per column keeps the statement (and its parameter count)
+    the same whatever the number of posts.
+
+    Args:
+        with_ids (bool): Also unnest a "post_ids" array (bulk update)
+
+    Returns:
+        sqlalchemy.sql.TableValuedAlias: (id,) title, content, published rows,
+            and their position in the arrays ("ordinality", from 1)
+    """
+    # Explicit casts, unnest() can't tell the parameter types otherwise
+    arrays = [
+        cast(bindparam("post_titles", type_=ARRAY(String)), ARRAY(String)),
+        cast(bindparam("post_contents", type_=ARRAY(String)), ARRAY(String)),
+        cast(bindparam("post_published", type_=ARRAY(Boolean)), ARRAY(Boolean)),
+    ]
+    names = ["title", "content", "published"]
+    if with_ids:
+        ids = bindparam("post_ids", type_=ARRAY(Integer))
+        arrays.insert(0, cast(ids, ARRAY(Integer)))
+        names.insert(0, "id")
+
+    return (
+        func.unnest(*arrays)
+        .table_valued(*names, with_ordinality="ordinality")
+        .render_derived()
+    )
+
+
+def bulk_insert_posts_query(owner_id: int):
+    """
+    Query to insert many posts of a user in one statement
+
+    Bind `post_titles`, `post_contents` and `post_published` arrays when executing.
+
+    RETURNING order isn't guaranteed, so every row takes its id from the sequence
+    up front along with its position in the arrays, and the inserted rows are
+    joined back on the id to come out in request order.
+
+    Args:
+        owner_id (int): Id of the posts owner
+
+    Returns:
+        sqlalchemy.sql.Select: select of RETURNED_COLUMNS of the inserted posts
+    """
+    rows = bulk_posts_rows()
+    numbered = select(
+        func.nextval(func.pg_get_serial_sequence(Post.__tablename__, "id")).label("id"),
+        rows.c.ordinality,
+        rows.c.title,
+        rows.c.content,
+        rows.c.published,
+    ).cte("numbered_posts")
+
+    inserted = (
+        insert(Post)
+        .from_select(
+            ["id", "title", "content", "published", "owner_id"],
+            select(
+                numbered.c.id,
+                numbered.c.title,
+                numbered.c.content,
+                numbered.c.published,
+                literal(owner_id, Integer),
+            ),
+        )
+        .returning(*RETURNED_COLUMNS)
+        .cte("inserted_posts")
+    )
+
+    return (
+        select(*inserted.c)
+        .join_from(inserted, numbered, inserted.c.id == numbered.c.id)
+        .order_by(numbered.c.ordinality)
+    )
+
+
+def bulk_update_posts_query(owner_id: int):
+    """
+    Query to update many posts of a user in one statement, posts owned by someone
+    else are left untouched
+
+    Bind `post_ids`, `post_titles`, `post_contents` and `post_published` arrays
+    when executing.
+
+    Args:
+        owner_id (int): Id of the posts owner
+
+    Returns:
+        sqlalchemy.sql.Update: update statement returning RETURNED_COLUMNS
+    """
+    rows = bulk_posts_rows(with_ids=True)
+    return (
+        update(Post)
+        .where(Post.id == rows.c.id, Post.owner_id == owner_id)
+        .values(
+            title=rows.c.title,
+            content=rows.c.content,
+            published=rows.c.published,
+            updated_at=func.now(),
+        )
+        .returning(*RETURNED_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def bulk_delete_posts_query(owner_id: int, post_ids: List[int]):
+    """
+    Query to delete many posts of a user, posts owned by someone else are kept
+
+    Args:
+        owner_id (int): Id of the posts owner
+        post_ids (List[int]): Ids of the posts
+
+    Returns:
+        sqlalchemy.sql.Delete: delete statement returning the deleted ids
+    """
+    ids = bindparam("post_ids", post_ids, type_=ARRAY(Integer))
+    return (
+        delete(Post)
+        .where(Post.id == any_(ids), Post.owner_id == owner_id)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def search_filter(search: str, mode: SearchMode):
+    """
+    Where clause matching posts for the search string
+
+    Args:
+        search (str): Search query string
+        mode (SearchMode): How to match posts
+
+    Returns:
+        sqlalchemy.sql.ClauseElement: Where clause (always true for no search)
+    """
+    if not search:
+        # An empty tsquery would match nothing
+        return true()
+
+    if mode == SearchMode.FULLTEXT:
+        # GIN index on posts.search_vector
+        return Post.search_vector.op("@@")(fulltext_query(search))
+
+    if mode == SearchMode.SUBSTRING:
+        # pg_trgm GIN indexes on posts.title / posts.content
+        pattern = "%{}%".format(
+            search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        )
+        return or_(
+            Post.title.ilike(pattern, escape="\\"),
+            Post.content.ilike(pattern, escape="\\"),
+        )
+
+    return Post.title.contains(search)
+
+
+def fulltext_query(search: str):
+    """tsquery of the search string (web search syntax: "quoted", or, -not)"""
+    return func.websearch_to_tsquery(FULLTEXT_CONFIG, search)
+
+
+def all_posts_query(
+    limit: int,
+    skip: int,
+    search: str,
+    after: Optional[tuple] = None,
+    mode: SearchMode = SearchMode.TITLE,
+    fields: Optional[Tuple[str, ...]] = None,
+):
+    """
+    Query for a page of posts, newest first (best match first for full text search)
+
+    Args:
+        limit (int): Number of posts to return
+        skip (int): Number of posts to skip (ignored when paging by cursor)
+        search (str): Search query string
+        after (tuple, Optional): Sort key of the last post of the previous page,
+            (created_at, id) or (rank, id) for full text search. Pages by keyset
+            instead of offset
+        mode (SearchMode): How `search` matches posts
+        fields (Tuple[str, ...], Optional): Only select these columns (see
+            posts_fields_query) instead of (Post, votes)
+
+    Returns:
+        sqlalchemy.sql.Select: (Post, votes) select statement, with a "rank"
+            column for full text search
+    """
+    base = posts_with_votes_query() if fields is None else posts_fields_query(fields)
+
+    if search and mode == SearchMode.FULLTEXT:
+        # Every match is ranked and sorted before the limit applies, so rank the
+        # bare ids first and only join the page's rows and owners afterwards
+        rank = func.ts_rank(Post.search_vector, fulltext_query(search))
+        page = (
+            select(Post.id, rank.label("rank"))
+            .where(search_filter(search, mode))
+            .order_by(rank.desc(), Post.id.desc())
+            .limit(limit)
+        )
+        if after:
+            page = page.where(tuple_(rank, Post.id) < tuple_(*after))
+        else:
+            page = page.offset(skip)
+        page = page.subquery()
+
+        return (
+            base.join(page, Post.id == page.c.id)
+            .add_columns(page.c.rank)
+            .order_by(page.c.rank.desc(), Post.id.desc())
+        )
+
+    query = (
+        base.where(search_filter(search, mode))
+        .order_by(Post.created_at.desc(), Post.id.desc())
         .limit(limit)
-        .offset(skip)
-        .all()
     )
 
+    if after:
+        return query.where(tuple_(Post.created_at, Post.id) < tuple_(*after))
+    return query.offset(skip)
 
-def get_single_post(post_id: int, database: Session) -> Dict:
+
+def export_posts_query(
+    search: str,
+    mode: SearchMode = SearchMode.TITLE,
+    fields: Tuple[str, ...] = EXPORT_FIELDS,
+):
+    """
+    Query for every post matching the search, in id order
+
+    Args:
+        search (str): Search query string
+        mode (SearchMode): How `search` matches posts (full text isn't ranked here)
+        fields (Tuple[str, ...]): Columns to select (see posts_fields_query)
+
+    Returns:
+        sqlalchemy.sql.Select: select statement of the labeled columns, fetched in
+            batches of POSTS_EXPORT_BATCH_SIZE rows from a server side cursor
+    """
+    return (
+        posts_fields_query(fields)
+        .where(search_filter(search, mode))
+        .order_by(Post.id)
+        .execution_options(yield_per=settings.POSTS_EXPORT_BATCH_SIZE)
+    )
+
+
+async def get_all_posts(
+    database: AsyncSession,
+    limit: int,
+    skip: int,
+    search: str,
+    after: Optional[tuple] = None,
+    mode: SearchMode = SearchMode.TITLE,
+    fields: Optional[Tuple[str, ...]] = None,
+    cache: bool = True,
+) -> Tuple[List[Dict], Optional[tuple]]:
+    """
+    Fetch list of all posts
+
+    Args:
+        database (AsyncSession): Database session
+        limit (int): Number of posts to return
+        skip (int): Number of posts to skip
+        search (str): Search query string
+        after (tuple, Optional): Sort key cursor position to continue from
+        mode (SearchMode): How `search` matches posts
+        fields (Tuple[str, ...], Optional): Only fetch these columns
+        cache (bool): Serve from / store in the posts cache
+
+    Returns:
+        tuple: List of posts ({"Post", "votes"} dicts, or flat dicts of the
+            requested fields), and the sort key of the last one (None if none)
+            to continue from
+    """
+    key = ("list", limit, skip, search, after, mode, fields)
+    if cache:
+        page = posts_cache.get(key)
+        if page is not MISSING:
+            return page
+
+    version = posts_cache.version
+    result = await database.execute(
+        all_posts_query(limit, skip, search, after, mode, fields)
+    )
+    rows = result.all()
+    if fields is None:
+        posts = [serialize_post(row) for row in rows]
+    else:
+        posts = [dict(row) for row in rows]
+        for post in posts:
+            post.pop("rank", None)  # only orders the page, it isn't a field
+    page = (posts, sort_key_of(rows[-1]) if rows else None)
+
+    if cache and fills_cache(database):
+        tags = [post_id_of(post) for post in posts]
+        posts_cache.set(key, page, tags, version)
+    return page
+
+
+async def get_single_post(
+    post_id: int, database: AsyncSession, cache: bool = True
+) -> Dict:
     """
     Get a single post with given post_id
 
     Args:
         post_id (int): Id of the required post
-        database (Session): Database session
+        database (AsyncSession): Database session
+        cache (bool): Serve from / store in the posts cache
 
     Returns:
         dict: Fetched post
     """
-    post = (
-        database.query(Post, func.count(Vote.post_id).label("votes"))
-        .join(Vote, Post.id == Vote.post_id, isouter=True)
-        .group_by(Post.id)
-        .filter(Post.id == post_id)
-        .first()
-    )
+    key = ("post", post_id)
+    if cache:
+        post = posts_cache.get(key)
+        if post is not MISSING:
+            return post
+
+    version = posts_cache.version
+    result = await database.execute(single_post_query(post_id))
+    post = result.first()
 
     if post:
+        post = serialize_post(post)
+        if cache and fills_cache(database):
+            posts_cache.set(key, post, version=version)
         return post
 
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found!")
 
 
-def create_post(post: Post, database: Session, current_user: User) -> Dict:
+async def stream_posts(
+    database: AsyncSession,
+    search: str,
+    mode: SearchMode = SearchMode.TITLE,
+    fields: Tuple[str, ...] = EXPORT_FIELDS,
+) -> AsyncIterator[Dict]:
+    """
+    Stream every post matching the search, only a batch of rows is held at once
+
+    Args:
+        database (AsyncSession): Database session
+        search (str): Search query string
+        mode (SearchMode): How `search` matches posts
+        fields (Tuple[str, ...]): Fields to fetch
+
+    Yields:
+        dict: Flat dict of the post fields
+    """
+    result = await database.stream(export_posts_query(search, mode, fields))
+    async for row in result.mappings():
+        yield dict(row)
+
+
+async def get_posts_by_ids(
+    post_ids: List[int], database: AsyncSession, cache: bool = True
+) -> Dict[int, Dict]:
+    """
+    Get many posts at once, posts which aren't cached are fetched in one query
+
+    Args:
+        post_ids (List[int]): Ids of the required posts
+        database (AsyncSession): Database session
+        cache (bool): Serve from / store in the posts cache
+
+    Returns:
+        dict: Fetched posts by id (missing posts are left out)
+    """
+    posts = {}
+    missing = []
+    for post_id in dict.fromkeys(post_ids):
+        post = posts_cache.get(("post", post_id)) if cache else MISSING
+        if post is MISSING:
+            missing.append(post_id)
+        else:
+            posts[post_id] = post
+
+    if missing:
+        version = posts_cache.version
+        result = await database.execute(posts_by_ids_query(missing))
+
+        for row in result.all():
+            post = serialize_post(row)
+            posts[row.Post.id] = post
+            if cache and fills_cache(database):
+                posts_cache.set(("post", row.Post.id), post, version=version)
+
+    return posts
+
+
+async def create_post(
+    post: Post, database: AsyncSession, current_user: User
+) -> Dict:
     """
     Create a new post
 
     Args:
         post (Post): New post data
-        database (Session): Database session
+        database (AsyncSession): Database session
         current_user (User): Current User object with info like ID
 
     Returns:
@@ -93,72 +754,167 @@ def create_post(post: Post, database: Session, current_user: User) -> Dict:
     inserted_post = Post(owner_id=current_user.id, **post.dict())
 
     database.add(inserted_post)
-    database.commit()
-    database.refresh(inserted_post)
+    await database.commit()
+    invalidate_created_post()
+    inserted_post = await get_post_with_owner(database, inserted_post.id)
 
     print("Post is created!")
     return inserted_post
 
 
-def update_post(
-    post_id: int, post: Post, database: Session, current_user: User
+async def update_post(
+    post_id: int, post: Post, database: AsyncSession, current_user: User
 ) -> Dict:
     """
-    Update a post
+    Update a post with a single UPDATE ... RETURNING, the post is only looked up
+    again when nothing was updated (to tell 403 from 404)
 
     Args:
         post_id (int): Id of the post
         post (Post): Updated post data
-        database (Session): Database session
+        database (AsyncSession): Database session
         current_user (User): Current User object with info like ID
 
+    Raises:
+        HTTPException: HTTP_403_FORBIDDEN
+        HTTPException: HTTP_404_NOT_FOUND
+
     Returns:
         dict: Updated post
     """
-    post_query = database.query(Post).filter(Post.id == post_id)
-    existing_post = post_query.first()
-
-    if existing_post:
-        if existing_post.owner_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to perform requested operation",
-            )
-        post_query.update(
-            {**post.dict(), **{"updated_at": "now()"}}, synchronize_session=False
-        )
-
-    database.commit()
-    updated_post = post_query.first()
+    result = await database.execute(
+        update_post_query(post_id, current_user.id, post.dict())
+    )
+    updated_post = result.mappings().first()
 
-    if updated_post:
-        return post_query.first()
+    if updated_post is None:
+        await raise_not_owned_or_missing(database, post_id)
 
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found!")
+    await database.commit()
+    invalidate_updated_post(post_id)
+    return {**updated_post, "owner": current_user}
 
 
-def delete_post(post_id: int, database: Session, current_user: User) -> bool:
+async def delete_post(
+    post_id: int, database: AsyncSession, current_user: User
+) -> bool:
     """
-    Delete a post
+    Delete a post with a single DELETE ... RETURNING, the post is only looked up
+    again when nothing was deleted (to tell 403 from 404)
 
     Args:
         post_id (int): Id of the post
+        database (AsyncSession): Database session
+        current_user (User): Current User object with info like ID
+
+    Raises:
+        HTTPException: HTTP_403_FORBIDDEN
+        HTTPException: HTTP_404_NOT_FOUND
 
     Returns:
         bool: Post is deleted?
     """
-    post_query = database.query(Post).filter(Post.id == post_id)
-    existing_post = post_query.first()
+    result = await database.execute(delete_post_query(post_id, current_user.id))
 
-    if existing_post:
-        if existing_post.owner_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not authorized to perform requested operation",
-            )
+    if result.scalar() is None:
+        await raise_not_owned_or_missing(database, post_id)
 
-        post_query.delete(synchronize_session=False)
-        database.commit()
-        return True
+    await database.commit()
+    invalidate_deleted_post(post_id)
+    return True
 
-    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found!")
+
+async def bulk_create_posts(
+    posts: List[Post], database: AsyncSession, current_user: User
+) -> List[Dict]:
+    """
+    Create many posts with a single INSERT ... RETURNING, in one transaction
+
+    Args:
+        posts (List[Post]): New posts data
+        database (AsyncSession): Database session
+        current_user (User): Current User object with info like ID
+
+    Returns:
+        list: Created posts, in request order
+    """
+    result = await database.execute(
+        bulk_insert_posts_query(current_user.id),
+        {
+            "post_titles": [post.title for post in posts],
+            "post_contents": [post.content for post in posts],
+            "post_published": [post.published for post in posts],
+        },
+    )
+    inserted_posts = [{**row, "owner": current_user} for row in result.mappings()]
+    await database.commit()
+    invalidate_created_post()
+
+    print(f"{len(inserted_posts)} posts are created!")
+    return inserted_posts
+
+
+async def bulk_update_posts(
+    posts: List[Post], database: AsyncSession, current_user: User
+) -> Tuple[List[Dict], List[int]]:
+    """
+    Update many posts of the current user with a single UPDATE ... RETURNING
+
+    Args:
+        posts (List[Post]): Updated posts data, with their ids
+        database (AsyncSession): Database session
+        current_user (User): Current User object with info like ID
+
+    Returns:
+        tuple: Updated posts, ids of the posts which don't exist or belong to
+            someone else (left untouched)
+    """
+    result = await database.execute(
+        bulk_update_posts_query(current_user.id),
+        {
+            "post_ids": [post.id for post in posts],
+            "post_titles": [post.title for post in posts],
+            "post_contents": [post.content for post in posts],
+            "post_published": [post.published for post in posts],
+        },
+    )
+    updated_posts = {
+        row["id"]: {**row, "owner": current_user} for row in result.mappings()
+    }
+    await database.commit()
+
+    for post_id in updated_posts:
+        invalidate_updated_post(post_id)
+
+    return (
+        [updated_posts[post.id] for post in posts if post.id in updated_posts],
+        [post.id for post in posts if post.id not in updated_posts],
+    )
+
+
+async def bulk_delete_posts(
+    post_ids: List[int], database: AsyncSession, current_user: User
+) -> Tuple[List[int], List[int]]:
+    """
+    Delete many posts of the current user with a single DELETE ... RETURNING
+
+    Args:
+        post_ids (List[int]): Ids of the posts
+        database (AsyncSession): Database session
+        current_user (User): Current User object with info like ID
+
+    Returns:
+        tuple: Deleted ids, ids of the posts which don't exist or belong to
+            someone else (kept)
+    """
+    result = await database.execute(bulk_delete_posts_query(current_user.id, post_ids))
+    deleted = set(result.scalars().all())
+    await database.commit()
+
+    for post_id in deleted:
+        invalidate_deleted_post(post_id)
+
+    return (
+        [post_id for post_id in post_ids if post_id in deleted],
+        [post_id for post_id in post_ids if post_id not in deleted],
+    )
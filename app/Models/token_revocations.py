@@ -0,0 +1,269 @@
+# pylint: disable=E0401, E0611, W0703
+
+"""
+Access token revocation (logout, "log out everywhere")
+
+Revocations are logged in the token_revocations table and mirrored in every
+worker's memory: a set of revoked token ids (jti) and, per user, the time before
+which all their tokens are revoked. Checking a token is then a couple of hash
+lookups, no database round-trip. Workers load the log at startup, and refuse
+every token until it is loaded, then poll it for new entries every
+TOKEN_REVOCATION_SYNC_INTERVAL seconds (reading the last
+TOKEN_REVOCATION_SYNC_WINDOW entries again), revocations made by a worker apply
+to it right away. Entries are dropped once every token they apply
+to has expired, which keeps both the table and the in-memory copy small.
+"""
+
+# Imports
+import time
+import asyncio
+from typing import Callable, Optional
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.Database import db
+from app.Models import users_model
+from app.Utils import crypt
+from app.schemas.users_schema import TokenData, TokenRevocation
+from app.settings import settings
+
+# App Settings
+settings = settings.Settings()
+
+
+class RevocationList:
+    """In-process copy of the token revocation log"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        sync_interval: float,
+        sync_window: int,
+    ):
+        self.session_factory = session_factory
+        self.sync_interval = sync_interval
+        self.sync_window = sync_window
+
+        # jti -> expiry (epoch seconds) of the revoked token
+        self.jtis: dict[str, float] = {}
+        # user_id -> (tokens issued before, expiry of the entry), epoch seconds
+        self.cutoffs: dict[int, tuple[float, float]] = {}
+        self.last_id = 0  # last log entry applied
+        self.loaded = False  # the whole log was read
+
+        self._task: Optional[asyncio.Task] = None
+
+        self.syncs = 0
+        self.sync_errors = 0
+        self.skipped_entries = 0
+        self.last_sync = None
+
+    # -------------------------------- Lookups --------------------------------- #
+    def is_revoked(self, token: TokenData) -> bool:
+        """
+        Is the access token revoked?
+
+        Args:
+            token (TokenData): Decoded access token
+
+        Returns:
+            bool: Revoked by its jti, or issued before its user's cutoff (every
+                token is, until the log is loaded)
+        """
+        if not self.loaded:
+            return True
+
+        if token.jti is not None and token.jti in self.jtis:
+            return True
+
+        cutoff = self.cutoffs.get(int(token.id))
+        # Tokens without iat predate revocation, any cutoff applies to them
+        return cutoff is not None and (token.iat or 0) < cutoff[0]
+
+    def apply(self, revocation):
+        """Add a token_revocations entry to the in-memory copy, malformed entries
+        are logged and skipped"""
+        seen = revocation.id <= self.last_id  # read again, see sync
+        self.last_id = max(self.last_id, revocation.id)
+
+        if revocation.expires_at is None or (
+            revocation.jti is None and revocation.revoked_before is None
+        ):
+            if not seen:
+                print("Skipping malformed token revocation ==>", revocation.id)
+                self.skipped_entries += 1
+            return
+
+        expires_at = revocation.expires_at.timestamp()
+
+        if revocation.jti is not None:
+            self.jtis[revocation.jti] = expires_at
+        else:
+            revoked_before = revocation.revoked_before.timestamp()
+            current = self.cutoffs.get(revocation.user_id)
+            if current is None or current[0] < revoked_before:
+                self.cutoffs[revocation.user_id] = (revoked_before, expires_at)
+
+    def prune(self):
+        """Drop entries every token they apply to has outlived"""
+        now = time.time()
+        self.jtis = {jti: exp for jti, exp in self.jtis.items() if exp > now}
+        self.cutoffs = {
+            user_id: cutoff
+            for user_id, cutoff in self.cutoffs.items()
+            if cutoff[1] > now
+        }
+
+    def clear(self):
+        """Forget everything, the next sync reloads the whole log"""
+        self.jtis = {}
+        self.cutoffs = {}
+        self.last_id = 0
+        self.loaded = False
+
+    # ------------------------------- Revocation ------------------------------- #
+    async def revoke(self, values: dict, database: AsyncSession):
+        """Log a revocation and apply it to this worker"""
+        result = await database.execute(users_model.add_revocation_query(values))
+        revocation = TokenRevocation(id=result.scalar(), **values)
+        await database.commit()
+        self.apply(revocation)
+        users_model.invalidate_user(values["user_id"])
+
+    async def revoke_token(
+        self, token: TokenData, database: AsyncSession, refresh_token: str = None
+    ):
+        """
+        Revoke a single access token (logout), and the refresh token sent with it
+
+        Tokens without a jti can't be told apart, for those every token of the
+        user issued up to the same second is revoked.
+
+        Args:
+            token (TokenData): Decoded access token
+            database (AsyncSession): Database session
+            refresh_token (str, Optional): Refresh token to drop as well
+        """
+        if refresh_token is not None:
+            await database.execute(
+                users_model.delete_refresh_tokens_query(
+                    int(token.id), crypt.hash_refresh_token(refresh_token)
+                )
+            )
+
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        values = {
+            "user_id": int(token.id),
+            "jti": token.jti,
+            "revoked_before": None,
+            "expires_at": (
+                datetime.fromtimestamp(token.exp, timezone.utc)
+                if token.exp is not None
+                else now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES + 1)
+            ),
+        }
+        if token.jti is None:
+            # Issued before tokens had a jti, revoke the user's tokens up to this
+            # one (its whole second, iat has a one second resolution)
+            values["revoked_before"] = (
+                datetime.fromtimestamp(token.iat + 1, timezone.utc)
+                if token.iat is not None
+                else now
+            )
+
+        await self.revoke(values, database)
+
+    async def revoke_user_tokens(self, user_id: int, database: AsyncSession):
+        """
+        Revoke every access and refresh token issued to the user so far
+
+        Args:
+            user_id (int): User id
+            database (AsyncSession): Database session
+        """
+        await database.execute(users_model.delete_refresh_tokens_query(user_id))
+
+        # iat has a one second resolution, cover the whole current second
+        now = datetime.now(timezone.utc).replace(microsecond=0) + timedelta(seconds=1)
+        await self.revoke(
+            {
+                "user_id": user_id,
+                "jti": None,
+                "revoked_before": now,
+                "expires_at": now
+                + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES + 1),
+            },
+            database,
+        )
+
+    # ---------------------------------- Sync ---------------------------------- #
+    async def sync(self):
+        """Apply the entries other workers logged since the last sync, and the
+        last sync_window entries again (for ones committed out of id order)"""
+        try:
+            async with self.session_factory() as database:
+                result = await database.execute(
+                    users_model.revocations_since_query(self.last_id, self.sync_window)
+                )
+                for revocation in result.scalars().all():
+                    self.apply(revocation)
+
+            self.prune()
+            self.loaded = True
+            self.syncs += 1
+            self.last_sync = time.time()
+
+        except Exception as error:
+            print("Error while syncing token revocations ==>", error)
+            self.sync_errors += 1
+
+    async def run(self):
+        """Poll the log every interval"""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            await self.sync()
+
+    async def start(self):
+        """Load the log, then keep polling it in the background (on app startup)"""
+        if self._task is None:
+            await self.sync()
+            if not self.loaded:
+                print("Revocation log not loaded, refusing tokens until it is")
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop syncing (on app shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --------------------------------- Metrics -------------------------------- #
+    def stats(self) -> dict:
+        """
+        Revocation list metrics
+
+        Returns:
+            dict: Revoked tokens and users, last entry applied and sync counters
+        """
+        return {
+            "revoked_tokens": len(self.jtis),
+            "revoked_users": len(self.cutoffs),
+            "loaded": self.loaded,
+            "last_id": self.last_id,
+            "syncs": self.syncs,
+            "sync_errors": self.sync_errors,
+            "skipped_entries": self.skipped_entries,
+            "last_sync": self.last_sync,
+        }
+
+
+revocation_list = RevocationList(
+    db.async_session_local,
+    settings.TOKEN_REVOCATION_SYNC_INTERVAL,
+    settings.TOKEN_REVOCATION_SYNC_WINDOW,
+)
@@ -5,19 +5,180 @@ Schema for incoming post requests data
 """
 
 # from datetime import datetime
+import secrets
+from datetime import datetime, timedelta, timezone
+
 import sqlalchemy
+from sqlalchemy import String, delete, func, literal, select, update
+from sqlalchemy.dialects.postgresql import TIMESTAMP, insert
 from fastapi import HTTPException, status
 
 from app.Utils import crypt
-from app.schemas.users_schema import User
+from app.Utils.cache import MISSING, TTLCache
+from app.schemas.users_schema import RefreshToken, TokenRevocation, User, UserResponse
+from app.settings import settings
 from app.Exceptions.post_exceptions import SomethingWentWrongException
 
+# App Settings
+settings = settings.Settings()
+
+# Users resolved from access tokens, by user id (per worker process)
+users_cache = TTLCache(settings.USERS_CACHE_TTL, settings.USERS_CACHE_MAX_BYTES)
+
+# ---------------------------------------------------------------------------- #
+#                                     Cache                                    #
+# ---------------------------------------------------------------------------- #
+
+
+def invalidate_user(user_id: int):
+    """Drop the cached user (this worker's copy), called when the user's password
+    hash or tokens change and when the user turns out to be gone"""
+    users_cache.invalidate(user_id)
+
+
+# ---------------------------------------------------------------------------- #
+#                                    Queries                                   #
+# ---------------------------------------------------------------------------- #
+
+
+def user_query(user_id: int):
+    """Query for the user with given user_id"""
+    return select(User).where(User.id == user_id)
+
+
+def user_by_email_query(email: str):
+    """Query for the user with given email"""
+    return select(User).where(User.email == email)
+
+
+def update_password_query(user_id: int, hashed_password: str):
+    """Query to replace the password hash of the user"""
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values(password=hashed_password)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh_token_expiry():
+    """Expiry of a refresh token issued now"""
+    return datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+def add_refresh_token_query(user_id: int, token_hash: str):
+    """
+    Query to store a new refresh token of the user, dropping their expired ones
+
+    Returns:
+        sqlalchemy.sql.Insert: insert statement
+    """
+    expired = (
+        delete(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.expires_at <= func.now())
+        .cte("expired_tokens")
+    )
+    return (
+        insert(RefreshToken)
+        .values(
+            token_hash=token_hash, user_id=user_id, expires_at=refresh_token_expiry()
+        )
+        .add_cte(expired)
+    )
+
+
+def rotate_refresh_token_query(token_hash: str, new_token_hash: str):
+    """
+    Query to swap a valid refresh token for a new one, in one statement. The old
+    token is deleted, so it can't be used twice
+
+    Returns:
+        sqlalchemy.sql.Insert: insert statement returning the user_id, no row if
+            the token is unknown or expired
+    """
+    used = (
+        delete(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.expires_at > func.now(),
+        )
+        .returning(RefreshToken.user_id)
+        .cte("used_token")
+    )
+    return (
+        insert(RefreshToken)
+        .from_select(
+            ["token_hash", "user_id", "expires_at"],
+            select(
+                literal(new_token_hash, String),
+                used.c.user_id,
+                literal(refresh_token_expiry(), TIMESTAMP(timezone=True)),
+            ),
+        )
+        .returning(RefreshToken.user_id)
+    )
+
+
+def delete_refresh_tokens_query(user_id: int, token_hash: str = None):
+    """Query to delete a refresh token of the user, or all of them"""
+    query = delete(RefreshToken).where(RefreshToken.user_id == user_id)
+    if token_hash is not None:
+        query = query.where(RefreshToken.token_hash == token_hash)
+    return query
+
+
+def add_revocation_query(values: dict):
+    """
+    Query to log a token revocation, dropping entries which outlived every token
+    they applied to
+
+    Returns:
+        sqlalchemy.sql.Insert: insert statement returning the new entry's id
+    """
+    expired = (
+        delete(TokenRevocation)
+        .where(TokenRevocation.expires_at <= func.now())
+        .cte("expired_revocations")
+    )
+    return (
+        insert(TokenRevocation)
+        .values(**values)
+        .returning(TokenRevocation.id)
+        .add_cte(expired)
+    )
+
+
+def revocations_since_query(last_id: int, window: int = 0):
+    """
+    Query for the revocations logged after entry `last_id` and still in force
+
+    Ids are taken at insert but show up at commit, so an entry can appear after
+    one with a higher id. The last `window` entries up to `last_id` are read
+    again to pick those up (applying an entry twice is harmless).
+
+    Args:
+        last_id (int): Last entry applied
+        window (int): Entries up to `last_id` to read again
+
+    Returns:
+        sqlalchemy.sql.Select: select statement of the entries, in id order
+    """
+    return (
+        select(TokenRevocation)
+        .where(
+            TokenRevocation.id > last_id - window,
+            TokenRevocation.expires_at > func.now(),
+        )
+        .order_by(TokenRevocation.id)
+    )
+
+
 # ---------------------------------------------------------------------------- #
 #                                 DB Operations                                #
 # ---------------------------------------------------------------------------- #
 
 
-def get_user(user_id, database):
+async def get_user(user_id, database):
     """
     Get a user with given post_id
 
@@ -27,7 +188,8 @@ def get_user(user_id, database):
     Returns:
         dict: User details
     """
-    user = database.query(User).filter(User.id == user_id).first()
+    result = await database.execute(user_query(user_id))
+    user = result.scalars().first()
 
     if user:
         return user
@@ -35,7 +197,37 @@ def get_user(user_id, database):
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found!")
 
 
-def get_user_by_email(creds, database):
+async def get_authenticated_user(user_id, database, fresh=False):
+    """
+    Get the user an access token was issued to, from the cache when possible
+
+    Args:
+        user_id (int): User id
+        database (AsyncSession): Database session
+        fresh (bool): Skip the cache and look the user up in the database
+
+    Returns:
+        UserResponse: User details (id, email, created_at), None if the user is gone
+    """
+    if not fresh:
+        user = users_cache.get(user_id)
+        if user is not MISSING:
+            return user
+
+    version = users_cache.version
+    result = await database.execute(user_query(user_id))
+    user = result.scalars().first()
+
+    if user is None:
+        invalidate_user(user_id)
+        return None
+
+    user = UserResponse.from_orm(user)
+    users_cache.set(user_id, user, version=version)
+    return user
+
+
+async def get_user_by_email(creds, database):
     """
     Get a user using email and validate the password
 
@@ -46,7 +238,8 @@ def get_user_by_email(creds, database):
         dict: User details
     """
     try:
-        return database.query(User).filter(User.email == creds.username).first()
+        result = await database.execute(user_by_email_query(creds.username))
+        return result.scalars().first()
 
     except Exception as error:
         print("ERROR while getting user by email")
@@ -54,7 +247,7 @@ def get_user_by_email(creds, database):
         raise SomethingWentWrongException(error) from error
 
 
-def create_user(user, database):
+async def create_user(user, database):
     """
     Create a new post
 
@@ -65,12 +258,13 @@ def create_user(user, database):
         dict: Update post data
     """
     try:
-        user.password = crypt.hash_password(user.password)
+        # bcrypt is CPU bound, keep it off the event loop and the threadpool
+        user.password = await crypt.password_hasher.hash(user.password)
         inserted_user = User(**user.dict())
 
         database.add(inserted_user)
-        database.commit()
-        database.refresh(inserted_user)
+        await database.commit()
+        await database.refresh(inserted_user)
 
         if inserted_user:
             return inserted_user
@@ -82,3 +276,70 @@ def create_user(user, database):
             status_code=status.HTTP_409_CONFLICT,
             detail="User already exists!",
         ) from error
+
+
+async def update_password_hash(user_id, hashed_password, database):
+    """
+    Store a new hash of the user's password (same password, e.g. new bcrypt cost)
+
+    Args:
+        user_id (int): User id
+        hashed_password (str): New password hash
+        database (AsyncSession): Database session
+    """
+    await database.execute(update_password_query(user_id, hashed_password))
+    await database.commit()
+    invalidate_user(user_id)
+
+
+async def create_refresh_token(user_id, database):
+    """
+    Issue a refresh token to the user
+
+    Args:
+        user_id (int): User id
+        database (AsyncSession): Database session
+
+    Returns:
+        str: Refresh token (only its hash is stored)
+    """
+    token = secrets.token_urlsafe(32)
+    await database.execute(
+        add_refresh_token_query(user_id, crypt.hash_refresh_token(token))
+    )
+    await database.commit()
+    return token
+
+
+async def rotate_refresh_token(token, database):
+    """
+    Swap a refresh token for a new one
+
+    Args:
+        token (str): Refresh token sent by the client
+        database (AsyncSession): Database session
+
+    Raises:
+        HTTPException: HTTP_401_UNAUTHORIZED [unknown, used or expired token]
+
+    Returns:
+        tuple[int, str]: User id and the new refresh token
+    """
+    new_token = secrets.token_urlsafe(32)
+    result = await database.execute(
+        rotate_refresh_token_query(
+            crypt.hash_refresh_token(token), crypt.hash_refresh_token(new_token)
+        )
+    )
+    user_id = result.scalar()
+
+    if user_id is None:
+        await database.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    await database.commit()
+    return user_id, new_token
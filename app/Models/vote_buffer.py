@@ -0,0 +1,234 @@
+# pylint: disable=E0401, E0611, W0703
+
+"""
+Write-behind buffering of votes (VOTE_WRITE_BEHIND)
+
+Votes are acknowledged once recorded in the worker's buffer, which keeps the last
+direction per (user_id, post_id). The buffer is flushed every
+VOTE_FLUSH_INTERVAL_MS, or as soon as it holds VOTE_FLUSH_MAX_ENTRIES votes, with
+one multi-row statement for added votes and one for removed votes, in a single
+transaction. Whatever is left is flushed on shutdown.
+
+Already voted / not voted checks look at the buffer (and the batch being
+flushed) before the database, so they hold across the flush. Buffered votes show
+up in reads once flushed.
+"""
+
+# Imports
+import time
+import asyncio
+from typing import Callable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.Database import db
+from app.Models import votes_model
+from app.Models.posts_model import invalidate_voted_post
+from app.schemas.users_schema import User
+from app.schemas.votes_schema import VoteRequest
+from app.settings import settings
+
+# App Settings
+settings = settings.Settings()
+
+
+class VoteBuffer:
+    """Per worker buffer of votes waiting to be written"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        enabled: bool,
+        flush_interval: float,
+        flush_max_entries: int,
+    ):
+        self.session_factory = session_factory
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.flush_max_entries = flush_max_entries
+
+        # (user_id, post_id) -> direction (1 = voted, 0 = not voted)
+        self.pending: dict[tuple[int, int], int] = {}
+        self.in_flight: dict[tuple[int, int], int] = {}
+
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        self.flushes = 0
+        self.flushed_votes = 0
+        self.flush_errors = 0
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    # ---------------------------------- Votes ----------------------------------- #
+    async def record(
+        self, vote: VoteRequest, database: AsyncSession, current_user: User
+    ) -> dict:
+        """
+        Buffer a vote, with the same checks and responses as votes_model.update_vote
+
+        Args:
+            vote (VoteRequest): Vote info
+            database (AsyncSession): Database session (for votes not buffered)
+            current_user (User): Current User object with info like ID
+
+        Raises:
+            HTTPException: HTTP_404_NOT_FOUND
+            HTTPException: HTTP_409_CONFLICT [already voted / not voted]
+
+        Returns:
+            dict: Response message
+        """
+        key = (current_user.id, vote.post_id)
+        voted = self.pending.get(key, self.in_flight.get(key))
+
+        if voted is None:
+            result = await database.execute(
+                votes_model.vote_state_query(vote.post_id, current_user.id)
+            )
+            state = result.first()
+
+            if state is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Post does not exists!",
+                )
+            # A vote of the same user on the same post may have been buffered
+            # while the query ran, it is newer than the database
+            voted = self.pending.get(key, self.in_flight.get(key, int(state.voted)))
+
+        if vote.dir == 1 and voted:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Cannot vote already voted post!",
+            )
+        if vote.dir == 0 and not voted:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Cannot down-vote a not voted this post!",
+            )
+
+        self.pending[key] = vote.dir
+        if len(self.pending) >= self.flush_max_entries:
+            self._wakeup.set()
+
+        return {"message": "Added Vote!" if vote.dir == 1 else "Removed Vote!"}
+
+    async def flush(self):
+        """Write every buffered vote, failed batches go back to the buffer"""
+        async with self._flush_lock:
+            if not self.pending:
+                return
+
+            self.in_flight, self.pending = self.pending, {}
+            start = time.perf_counter()
+
+            added = [key for key, direction in self.in_flight.items() if direction]
+            removed = [key for key, direction in self.in_flight.items() if not direction]
+
+            try:
+                async with self.session_factory() as database:
+                    post_ids = set()
+                    for keys, query in (
+                        (added, votes_model.add_votes_query()),
+                        (removed, votes_model.remove_votes_query()),
+                    ):
+                        if keys:
+                            result = await database.execute(
+                                query,
+                                {
+                                    "vote_user_ids": [user_id for user_id, _ in keys],
+                                    "vote_post_ids": [post_id for _, post_id in keys],
+                                },
+                            )
+                            post_ids.update(result.scalars().all())
+                    await database.commit()
+
+            except Exception as error:
+                print("Error while flushing votes ==>", error)
+                self.flush_errors += 1
+                self.requeue_in_flight()
+                return
+
+            except BaseException:
+                # Cancelled, the batch goes out with the next flush (re-applying
+                # it is harmless if it was committed after all)
+                self.requeue_in_flight()
+                raise
+
+            for post_id in post_ids:
+                invalidate_voted_post(post_id)
+
+            elapsed = time.perf_counter() - start
+            self.flushes += 1
+            self.flushed_votes += len(self.in_flight)
+            self.total_flush_time += elapsed
+            self.max_flush_time = max(self.max_flush_time, elapsed)
+            self.in_flight = {}
+
+    def requeue_in_flight(self):
+        """Put the batch being flushed back in the buffer"""
+        # Votes recorded meanwhile are newer, keep those
+        self.pending = {**self.in_flight, **self.pending}
+        self.in_flight = {}
+
+    # -------------------------------- Lifecycle --------------------------------- #
+    async def run(self):
+        """Flush every interval, or sooner when the buffer fills up, until stopped"""
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        """Start the background flush (on app startup)"""
+        if self.enabled and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Stop the background flush and write what is left (on app shutdown)"""
+        if self._task is not None:
+            # Not cancelled, a flush in progress runs to completion
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+
+        await self.flush()
+
+    # ---------------------------------- Metrics --------------------------------- #
+    def stats(self) -> dict:
+        """
+        Buffer metrics
+
+        Returns:
+            dict: Buffer depth, flush counters and flush latency
+        """
+        return {
+            "enabled": self.enabled,
+            "depth": len(self.pending),
+            "in_flight": len(self.in_flight),
+            "flushes": self.flushes,
+            "flushed_votes": self.flushed_votes,
+            "flush_errors": self.flush_errors,
+            "flush_avg_ms": (
+                self.total_flush_time / self.flushes * 1000 if self.flushes else 0
+            ),
+            "flush_max_ms": self.max_flush_time * 1000,
+        }
+
+
+vote_buffer = VoteBuffer(
+    db.async_session_local,
+    settings.VOTE_WRITE_BEHIND,
+    settings.VOTE_FLUSH_INTERVAL_MS / 1000,
+    settings.VOTE_FLUSH_MAX_ENTRIES,
+)
@@ -5,65 +5,243 @@ Schema for incoming post requests data
 """
 
 # Imports
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, bindparam, cast, delete, exc, func, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, status
 
+from app.schemas.posts_schema import Post
 from app.schemas.users_schema import User
 from app.schemas.votes_schema import Vote, VoteRequest
-from app.Models.posts_model import check_if_post_exists
+from app.Models.posts_model import (
+    invalidate_voted_post,
+    post_id_query,
+    vote_count_query,
+)
+
+# SQLSTATE of a foreign key violation (vote on a post which doesn't exist)
+FOREIGN_KEY_VIOLATION = "23503"
 
 # ---------------------------------------------------------------------------- #
-#                                 DB Operations                                #
+#                                    Queries                                   #
 # ---------------------------------------------------------------------------- #
 
 
-def update_vote(vote: VoteRequest, database: Session, current_user: User):
+def delete_vote_query(post_id: int, user_id: int):
+    """Query to remove the vote of a user on a post"""
+    return (
+        delete(Vote)
+        .where(Vote.post_id == post_id, Vote.user_id == user_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def add_vote_query(post_id: int, user_id: int):
+    """
+    Query to add the vote of a user on a post and count it, in one statement
+
+    Returns:
+        sqlalchemy.sql.Update: update statement returning the post id, no row if
+            the user already voted
+    """
+    inserted = (
+        insert(Vote)
+        .values(post_id=post_id, user_id=user_id)
+        .on_conflict_do_nothing()
+        .returning(Vote.post_id)
+        .cte("inserted_vote")
+    )
+    return (
+        vote_count_query(post_id, 1)
+        .where(Post.id == inserted.c.post_id)
+        .returning(Post.id)
+    )
+
+
+def remove_vote_query(post_id: int, user_id: int):
+    """
+    Query to remove the vote of a user on a post and uncount it, in one statement
+
+    Returns:
+        sqlalchemy.sql.Update: update statement returning the post id, no row if
+            there was no vote (or no post)
+    """
+    deleted = (
+        delete_vote_query(post_id, user_id).returning(Vote.post_id).cte("deleted_vote")
+    )
+    return (
+        vote_count_query(post_id, -1)
+        .where(Post.id == deleted.c.post_id)
+        .returning(Post.id)
+    )
+
+
+def vote_state_query(post_id: int, user_id: int):
+    """
+    Query for the post id and whether the user voted on it
+
+    Returns:
+        sqlalchemy.sql.Select: (id, voted) select statement, no row if the post
+            doesn't exist
+    """
+    voted = (
+        select(Vote.post_id)
+        .where(Vote.post_id == post_id, Vote.user_id == user_id)
+        .exists()
+    )
+    return select(Post.id, voted.label("voted")).where(Post.id == post_id)
+
+
+def votes_rows():
     """
-    Update a vote for post
+    (post_id, user_id) rows of a batch of votes, unnested from `vote_post_ids`
+    and `vote_user_ids` arrays (same statement whatever the batch size)
+
+    Returns:
+        sqlalchemy.sql.TableValuedAlias: post_id, user_id rows
+    """
+    return (
+        func.unnest(
+            cast(bindparam("vote_post_ids", type_=ARRAY(Integer)), ARRAY(Integer)),
+            cast(bindparam("vote_user_ids", type_=ARRAY(Integer)), ARRAY(Integer)),
+        )
+        .table_valued("post_id", "user_id")
+        .render_derived()
+    )
+
+
+def count_changed_votes_query(changed, sign: int):
+    """
+    Query to add (sign=1) or subtract (sign=-1) the votes a CTE returned to the
+    vote counts of their posts
 
     Args:
-        vote (VoteRequest): New post data
-        database (Session): Database session
-        current_user (User): Current User object with info like ID
+        changed (sqlalchemy.sql.CTE): CTE returning the post_id of each vote
+        sign (int): 1 for added votes, -1 for removed ones
 
     Returns:
-        dict: User details
+        sqlalchemy.sql.Update: update statement returning the changed post ids
     """
-    post_id = vote.post_id
-    user_id = current_user.id
+    counts = (
+        select(changed.c.post_id, func.count().label("votes"))
+        .group_by(changed.c.post_id)
+        .subquery()
+    )
+    return (
+        update(Post)
+        .where(Post.id == counts.c.post_id)
+        .values(vote_count=Post.vote_count + sign * counts.c.votes)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
 
-    # Check if post exists
-    post = check_if_post_exists(database, post_id)
 
-    if not post:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Post does not exists!"
+def add_votes_query():
+    """
+    Query to add a batch of votes and count them, in one statement. Votes which
+    already exist, or whose post/user is gone, are skipped
+
+    Returns:
+        sqlalchemy.sql.Update: update statement returning the changed post ids
+    """
+    rows = votes_rows()
+    inserted = (
+        insert(Vote)
+        .from_select(
+            ["post_id", "user_id"],
+            select(rows.c.post_id, rows.c.user_id)
+            .join(Post, Post.id == rows.c.post_id)
+            .join(User, User.id == rows.c.user_id),
         )
+        .on_conflict_do_nothing()
+        .returning(Vote.post_id)
+        .cte("inserted_votes")
+    )
+    return count_changed_votes_query(inserted, 1)
+
 
-    vote_query = database.query(Vote).filter(
-        Vote.post_id == post_id, Vote.user_id == user_id
+def remove_votes_query():
+    """
+    Query to remove a batch of votes and uncount them, in one statement
+
+    Returns:
+        sqlalchemy.sql.Update: update statement returning the changed post ids
+    """
+    rows = votes_rows()
+    deleted = (
+        delete(Vote)
+        .where(Vote.post_id == rows.c.post_id, Vote.user_id == rows.c.user_id)
+        .returning(Vote.post_id)
+        .cte("deleted_votes")
     )
+    return count_changed_votes_query(deleted, -1)
+
+
+# ---------------------------------------------------------------------------- #
+#                                 DB Operations                                #
+# ---------------------------------------------------------------------------- #
+
+
+async def update_vote(
+    vote: VoteRequest, database: AsyncSession, current_user: User
+):
+    """
+    Update a vote for post, the vote and the post vote count change in a single
+    statement. Concurrent identical votes can't conflict (ON CONFLICT DO NOTHING)
 
-    found_vote = vote_query.first()
+    Args:
+        vote (VoteRequest): New post data
+        database (AsyncSession): Database session
+        current_user (User): Current User object with info like ID
+
+    Raises:
+        HTTPException: HTTP_404_NOT_FOUND
+        HTTPException: HTTP_409_CONFLICT [already voted / not voted]
+
+    Returns:
+        dict: User details
+    """
+    post_id = vote.post_id
+    user_id = current_user.id
 
     if vote.dir == 1:
-        if found_vote:
+        try:
+            result = await database.execute(add_vote_query(post_id, user_id))
+
+        except exc.IntegrityError as error:
+            await database.rollback()
+            if getattr(error.orig, "pgcode", None) == FOREIGN_KEY_VIOLATION:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Post does not exists!",
+                )
+            raise
+
+        if result.scalar() is None:
             raise HTTPException(
                 status_code=status.HTTP_409_CONFLICT,
                 detail="Cannot vote already voted post!",
             )
 
-        new_vote = Vote(post_id=post_id, user_id=user_id)
-        database.add(new_vote)
-        database.commit()
+        await database.commit()
+        invalidate_voted_post(post_id)
         return {"message": "Added Vote!"}
 
-    if not found_vote:
+    result = await database.execute(remove_vote_query(post_id, user_id))
+
+    if result.scalar() is None:
+        # Nothing removed, only now find out whether the post exists at all
+        result = await database.execute(post_id_query(post_id))
+        if result.scalar() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Post does not exists!"
+            )
+
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Cannot down-vote a not voted this post!",
         )
 
-    vote_query.delete(synchronize_session=False)
-    database.commit()
+    await database.commit()
+    invalidate_voted_post(post_id)
     return {"message": "Removed Vote!"}
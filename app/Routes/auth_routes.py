@@ -5,14 +5,15 @@ Routes for USERS related operations
 """
 
 # Imports
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status, APIRouter
 from fastapi.security.oauth2 import OAuth2PasswordRequestForm
 
 from app.Utils import crypt, oauth2
 from app.Models import users_model
+from app.Models.token_revocations import revocation_list
 from app.schemas import users_schema
-from app.Database.db import connect_to_postgres_db
+from app.Database.db import connect_to_async_postgres_db
 from app.Exceptions.post_exceptions import SomethingWentWrongException
 
 
@@ -25,9 +26,9 @@ router = APIRouter(tags=["Authentication"])
 
 
 @router.post("/api/login", response_model=users_schema.AuthToken)
-def login(
+async def login(
     creds: OAuth2PasswordRequestForm = Depends(),
-    database: Session = Depends(connect_to_postgres_db)
+    database: AsyncSession = Depends(connect_to_async_postgres_db)
 ):
     """
     Login user and return a JWT access token
@@ -36,35 +37,47 @@ def login(
         creds (OAuth2PasswordRequestForm): User creds - username, password
         [above requires data as form fields]
 
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
 
     Raises:
         HTTPException: HTTP_403_FORBIDDEN
+        HTTPException: HTTP_503_SERVICE_UNAVAILABLE [too many logins in progress]
         HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
 
     Returns:
-        str: JWT access Token
+        dict: JWT access token and refresh token
     """
     try:
         # Get user
-        user = users_model.get_user_by_email(creds, database)
+        user = await users_model.get_user_by_email(creds, database)
 
         if user is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials"
             )
 
-        # Verify password
-        if not crypt.verify(creds.password, user.password):
+        # Verify password (bcrypt is CPU bound, keep it off the event loop)
+        valid, new_hash = await crypt.password_hasher.verify_and_update(
+            creds.password, user.password
+        )
+        if not valid:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials"
             )
 
+        # Stored hash uses another bcrypt cost than BCRYPT_ROUNDS, keep the new one
+        if new_hash is not None:
+            await users_model.update_password_hash(user.id, new_hash, database)
+
         # Create a JWT Token
         access_token = oauth2.create_access_token(data = {"user_id": user.id})
-        # access_token = "this is token"
-        return {"access_token": access_token, "token_type": "bearer"}
+        refresh_token = await users_model.create_refresh_token(user.id, database)
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "refresh_token": refresh_token,
+        }
 
     except SomethingWentWrongException as error:
         print("Error in routes:", error)
@@ -73,3 +86,111 @@ def login(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Something went wrong!",
         )
+
+
+@router.post("/api/token/refresh", response_model=users_schema.AuthToken)
+async def refresh(
+    request: users_schema.RefreshTokenRequest,
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
+):
+    """
+    Swap a refresh token for a new access token (and a new refresh token, the
+    one sent can't be used again), without the password check of /api/login
+
+    Args:
+        request (users_schema.RefreshTokenRequest): Refresh token
+
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
+
+    Raises:
+        HTTPException: HTTP_401_UNAUTHORIZED [unknown, used or expired token]
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+
+    Returns:
+        dict: JWT access token and refresh token
+    """
+    try:
+        user_id, refresh_token = await users_model.rotate_refresh_token(
+            request.refresh_token, database
+        )
+        access_token = oauth2.create_access_token(data={"user_id": user_id})
+        return {
+            "access_token": access_token,
+            "token_type": "bearer",
+            "refresh_token": refresh_token,
+        }
+
+    except HTTPException as error:
+        raise error
+
+    except Exception as error:
+        print("Error in routes:", error)
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Something went wrong!",
+        )
+
+
+@router.post("/api/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: users_schema.LogoutRequest = None,
+    token: users_schema.TokenData = Depends(oauth2.get_current_token),
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
+):
+    """
+    Revoke the access token of the request, and the refresh token sent with it
+
+    Args:
+        request (users_schema.LogoutRequest, optional): Refresh token to drop
+
+        token (users_schema.TokenData): Access token of the request
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
+
+    Raises:
+        HTTPException: HTTP_401_UNAUTHORIZED
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+    """
+    try:
+        await revocation_list.revoke_token(
+            token, database, request.refresh_token if request else None
+        )
+
+    except Exception as error:
+        print("Error in routes:", error)
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Something went wrong!",
+        )
+
+
+@router.post("/api/logout/all", status_code=status.HTTP_204_NO_CONTENT)
+async def logout_everywhere(
+    token: users_schema.TokenData = Depends(oauth2.get_current_token),
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
+):
+    """
+    Revoke every access and refresh token issued to the user so far
+
+    Args:
+        token (users_schema.TokenData): Access token of the request
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
+
+    Raises:
+        HTTPException: HTTP_401_UNAUTHORIZED
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+    """
+    try:
+        await revocation_list.revoke_user_tokens(int(token.id), database)
+
+    except Exception as error:
+        print("Error in routes:", error)
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Something went wrong!",
+        )
@@ -0,0 +1,129 @@
+# pylint: disable=E0401
+
+"""
+Internal routes for operational metrics
+
+Served only to callers sending the INTERNAL_API_TOKEN shared secret in the
+X-Internal-Token header (the routes are off while it isn't set).
+"""
+
+# Imports
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+
+from app.Database import db, replicas
+from app.Utils import crypt, oauth2
+from app.Utils.rate_limit import admission
+from app.Models import posts_model, users_model
+from app.Models.vote_buffer import vote_buffer
+from app.Models.token_revocations import revocation_list
+from app.settings import settings
+
+# App Settings
+settings = settings.Settings()
+
+
+def verify_internal_token(x_internal_token: str = Header(None)):
+    """
+    Check the internal API shared secret
+
+    Args:
+        x_internal_token (str, optional): X-Internal-Token request header
+
+    Raises:
+        HTTPException: HTTP_403_FORBIDDEN [missing/wrong token, or no token configured]
+    """
+    if not (
+        settings.INTERNAL_API_TOKEN
+        and x_internal_token
+        and hmac.compare_digest(
+            x_internal_token.encode(), settings.INTERNAL_API_TOKEN.encode()
+        )
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized!"
+        )
+
+
+# FastAPI Router
+router = APIRouter(
+    prefix="/api/internal",
+    tags=["Internal"],
+    include_in_schema=False,
+    dependencies=[Depends(verify_internal_token)],
+)
+
+# ---------------------------------------------------------------------------- #
+#                                    Routes                                    #
+# ---------------------------------------------------------------------------- #
+
+
+@router.get("/pool")
+async def get_pool_metrics():
+    """
+    Return connection pool metrics of this worker process
+
+    Returns:
+        dict: Checkout wait time, in-use/overflow connections and timeouts per engine
+    """
+    return {**db.pool_metrics(), **replicas.replica_router.pool_metrics()}
+
+
+@router.get("/cache")
+async def get_cache_metrics():
+    """
+    Return posts, users and verified tokens cache metrics of this worker process
+
+    Returns:
+        dict: Hits, misses, evictions, expirations, invalidations and memory used
+    """
+    return {
+        "posts": posts_model.posts_cache.stats(),
+        "users": users_model.users_cache.stats(),
+        "tokens": oauth2.tokens_cache.stats(),
+    }
+
+
+@router.get("/votes")
+async def get_vote_buffer_metrics():
+    """
+    Return write-behind vote buffer metrics of this worker process
+
+    Returns:
+        dict: Buffer depth, flush counters and flush latency
+    """
+    return vote_buffer.stats()
+
+
+@router.get("/passwords")
+async def get_password_hasher_metrics():
+    """
+    Return bcrypt process pool metrics of this worker process
+
+    Returns:
+        dict: Running and queued calls, completed and rejected calls
+    """
+    return crypt.password_hasher.stats()
+
+
+@router.get("/revocations")
+async def get_revocation_metrics():
+    """
+    Return token revocation list metrics of this worker process
+
+    Returns:
+        dict: Revoked tokens and users, last log entry applied and sync counters
+    """
+    return revocation_list.stats()
+
+
+@router.get("/admission")
+async def get_admission_metrics():
+    """
+    Return rate limiting and admission control metrics of this worker process
+
+    Returns:
+        dict: In-flight and queued requests, tracked clients, limited and shed requests
+    """
+    return admission.stats()
@@ -5,49 +5,296 @@ Routes for POSTS related operations
 """
 
 # Imports
+import json
+from datetime import datetime
 from typing import Optional
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, Response, status, APIRouter
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, Header, HTTPException, Query, Response, status, APIRouter
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from app.Utils import oauth2
+from app.Utils import etag, oauth2, pagination
 from app.Models import posts_model
 from app.schemas import posts_schema
-from app.Database.db import connect_to_postgres_db
+from app.Database.db import connect_to_async_postgres_db
+from app.Database.replicas import connect_to_read_db, replica_router
+from app.settings import settings
+
+# App Settings
+settings = settings.Settings()
 
 # FastAPI Router
 router = APIRouter(prefix="/api/posts", tags=["Posts"])
 
+# Range of posts.id (postgres INTEGER)
+INT32_MIN, INT32_MAX = -(2**31), 2**31 - 1
+
+# ---------------------------------------------------------------------------- #
+#                                Helper Functions                              #
+# ---------------------------------------------------------------------------- #
+
+
+def parse_fields(fields: Optional[str]) -> Optional[tuple]:
+    """
+    Parse the `fields` query param
+
+    Args:
+        fields (str, Optional): Comma separated post fields
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [unknown field]
+
+    Returns:
+        tuple: Requested fields, None when not given
+    """
+    if not fields:
+        return None
+
+    requested = tuple(field.strip() for field in fields.split(","))
+    if not set(requested) <= set(posts_model.POST_FIELDS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid fields!"
+        )
+    return requested
+
+
+def parse_ids(ids: str, max_ids: int) -> list[int]:
+    """
+    Parse an `ids` query param
+
+    Args:
+        ids (str): Comma separated post ids
+        max_ids (int): Most ids allowed
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [invalid, none or too many ids]
+
+    Returns:
+        list[int]: Post ids, in the given order
+    """
+    try:
+        post_ids = [int(post_id) for post_id in ids.split(",") if post_id.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ids!"
+        )
+
+    # asyncpg can't send larger ids as an INTEGER
+    if any(not INT32_MIN <= post_id <= INT32_MAX for post_id in post_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ids!"
+        )
+
+    check_item_count(post_ids, max_ids, "ids")
+    return post_ids
+
+
+def check_item_count(items: list, max_items: int, name: str):
+    """
+    Check a batch isn't empty nor larger than allowed
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST
+    """
+    if not items or len(items) > max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Between 1 and {max_items} {name} are allowed!",
+        )
+
+
 # ---------------------------------------------------------------------------- #
 #                                    Routes                                    #
 # ---------------------------------------------------------------------------- #
 
 
-@router.get("/", response_model=list[posts_schema.PostResponse])
-def get_posts(
-    database: Session = Depends(connect_to_postgres_db),
+@router.get(
+    "/",
+    response_model=list[posts_schema.PostResponse],
+    responses={
+        200: {
+            "description": "Posts, or their summary/requested fields",
+            "model": list[posts_schema.PostResponse] | list[posts_schema.PostSummary],
+        }
+    },
+)
+async def get_posts(
+    response: Response,
+    database: AsyncSession = Depends(connect_to_read_db),
     current_user: int = Depends(oauth2.get_current_user),
-    limit: int = 10,
-    skip: int = 0,
+    limit: int = Query(10, ge=1, le=settings.POSTS_MAX_LIMIT),
+    skip: int = Query(0, ge=0),
     search: Optional[str] = "",
+    mode: posts_schema.SearchMode = posts_schema.SearchMode.TITLE,
+    cursor: Optional[str] = None,
+    view: posts_schema.PostView = posts_schema.PostView.FULL,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
 ):
     """
-    Return all posts.
+    Return all posts, newest first.
 
     Args:
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        response (Response): Outgoing response, carries the X-Next-Cursor and ETag
+            headers
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_read_db).
         current_user (int): Logged in user ID
-        limit (int): Number of posts to be shown
+        limit (int): Number of posts to be shown, at most POSTS_MAX_LIMIT
         skip (int): Number of posts to be skipped
         search (str, Optional): Search string
+        mode (posts_schema.SearchMode): How search matches posts - title (default),
+            fulltext (ranked, title + content) or substring (title + content)
+        cursor (str, Optional): X-Next-Cursor of the previous page, pages by keyset
+            (skip is ignored) so deep pages cost the same as the first one
+        view (posts_schema.PostView): full posts (default), or their summary
+        fields (str, Optional): Comma separated fields to send instead (see
+            posts_model.POST_FIELDS), only these columns are fetched
+        if_none_match (str, Optional): ETag of the client's copy of the page
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [invalid cursor/fields]
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+
     Returns:
-        list[dict]: all/limited posts
+        list[dict]: all/limited posts (304 Not Modified if the ETag matches)
     """
+    projection = parse_fields(fields)
+    if not projection and view == posts_schema.PostView.SUMMARY:
+        projection = posts_model.SUMMARY_FIELDS
+
     try:
-        posts = posts_model.get_all_posts(database, limit, skip, search)
+        ranked = bool(search) and mode == posts_schema.SearchMode.FULLTEXT
+        sort_key_types = (float, int) if ranked else (datetime.fromisoformat, int)
+
+        after = pagination.decode_cursor(cursor, *sort_key_types) if cursor else None
+        # Skip the cache while the user reads their own writes from the primary
+        posts, last_key = await posts_model.get_all_posts(
+            database,
+            limit,
+            skip,
+            search,
+            after,
+            mode,
+            projection,
+            cache=not replica_router.wrote_recently(current_user.id),
+        )
+
+        if len(posts) == limit:
+            response.headers["X-Next-Cursor"] = pagination.encode_cursor(*last_key)
+
+        if projection:
+            # Flat dicts of the requested columns, send them as they are
+            page = JSONResponse(jsonable_encoder(posts), headers=response.headers)
+            tag = etag.body_etag(page.body)
+            if etag.etag_matches(if_none_match, tag):
+                return etag.not_modified(tag, response.headers)
+            page.headers["ETag"] = tag
+            return page
+
+        tag = etag.posts_etag(posts)
+        if etag.etag_matches(if_none_match, tag):
+            return etag.not_modified(tag, response.headers)
+        response.headers["ETag"] = tag
+
         print("[API /posts] Fetched all posts")
         return posts
 
+    except pagination.InvalidCursorException:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor!"
+        )
+
+    except Exception as error:
+        print("Error:", error)
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Something went wrong!",
+        )
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_posts(
+    database: AsyncSession = Depends(connect_to_read_db),
+    current_user: int = Depends(oauth2.get_current_user),
+    search: Optional[str] = "",
+    mode: posts_schema.SearchMode = posts_schema.SearchMode.TITLE,
+    fields: Optional[str] = None,
+):
+    """
+    Stream every post matching the search as NDJSON (one post per line), in id
+    order. Rows are read from a server side cursor in batches, so memory use
+    doesn't grow with the number of posts.
+
+    Args:
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_read_db).
+        current_user (int): Logged in user ID
+        search (str, Optional): Search string
+        mode (posts_schema.SearchMode): How search matches posts
+        fields (str, Optional): Comma separated fields to send (all by default)
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [invalid fields]
+
+    Returns:
+        StreamingResponse: application/x-ndjson stream of posts
+    """
+    projection = parse_fields(fields) or posts_model.EXPORT_FIELDS
+
+    async def ndjson():
+        try:
+            async for post in posts_model.stream_posts(
+                database, search, mode, projection
+            ):
+                yield json.dumps(post, default=datetime.isoformat) + "\n"
+
+        except Exception as error:
+            # Headers are already sent, all we can do is cut the stream short
+            print("Error while exporting posts:", error)
+            raise
+
+    print("[API /posts/export] Exporting posts")
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@router.get("/batch", response_model=list[posts_schema.PostBatchItem])
+async def get_posts_batch(
+    ids: str,
+    database: AsyncSession = Depends(connect_to_read_db),
+    current_user: int = Depends(oauth2.get_current_user),
+):
+    """
+    Return many posts in one call, in the requested order
+
+    Args:
+        ids (str): Comma separated post ids, at most POSTS_BATCH_MAX_IDS
+
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_read_db).
+        current_user (int): Logged in user ID
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [invalid or too many ids]
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+
+    Returns:
+        list[dict]: {"id", "found", "post"} per requested id
+    """
+    post_ids = parse_ids(ids, settings.POSTS_BATCH_MAX_IDS)
+
+    try:
+        posts = await posts_model.get_posts_by_ids(
+            post_ids,
+            database,
+            cache=not replica_router.wrote_recently(current_user.id),
+        )
+        return [
+            {"id": post_id, "found": post_id in posts, "post": posts.get(post_id)}
+            for post_id in post_ids
+        ]
+
     except Exception as error:
         print("Error:", error)
 
@@ -58,30 +305,43 @@ def get_posts(
 
 
 @router.get("/{post_id}", response_model=posts_schema.PostResponse)
-def get_post(
+async def get_post(
     post_id: int,
-    database: Session = Depends(connect_to_postgres_db),
+    response: Response,
+    database: AsyncSession = Depends(connect_to_read_db),
     current_user: int = Depends(oauth2.get_current_user),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Return a post content
 
     Args:
         post_id (int): Post id
+        response (Response): Outgoing response, carries the ETag header
 
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_read_db).
         current_user (int): Logged in user ID
+        if_none_match (str, Optional): ETag of the client's copy of the post
 
     Raises:
         HTTPException: HTTP_404_NOT_FOUND
         HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
 
     Returns:
-        dict: Post contents
+        dict: Post contents (304 Not Modified if the ETag matches)
     """
     try:
-        post = posts_model.get_single_post(post_id, database)
+        post = await posts_model.get_single_post(
+            post_id,
+            database,
+            cache=not replica_router.wrote_recently(current_user.id),
+        )
+
+        tag = etag.post_etag(post)
+        if etag.etag_matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        response.headers["ETag"] = tag
         return post
 
     except HTTPException as error:
@@ -101,9 +361,9 @@ def get_post(
     status_code=status.HTTP_201_CREATED,
     response_model=posts_schema.PostData,
 )
-def create_post(
+async def create_post(
     new_post: posts_schema.PostCreate,
-    database: Session = Depends(connect_to_postgres_db),
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
     current_user: int = Depends(oauth2.get_current_user),
 ):
     """
@@ -112,8 +372,8 @@ def create_post(
     Args:
         new_post (posts_schema.PostCreate): New post data contents
 
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
         current_user (int): Logged in user ID
 
     Raises:
@@ -123,7 +383,8 @@ def create_post(
         dict: Newly created post content
     """
     try:
-        inserted_post = posts_model.create_post(new_post, database, current_user)
+        inserted_post = await posts_model.create_post(new_post, database, current_user)
+        replica_router.record_write(current_user.id)
         return inserted_post
 
     except HTTPException as error:
@@ -138,11 +399,149 @@ def create_post(
         )
 
 
+# Bulk routes are registered before their /{post_id} counterparts to match first
+
+
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_201_CREATED,
+    response_model=list[posts_schema.PostData],
+)
+async def bulk_create_posts(
+    new_posts: list[posts_schema.PostCreate],
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
+    current_user: int = Depends(oauth2.get_current_user),
+):
+    """
+    Create many posts at once (one INSERT, one transaction)
+
+    Args:
+        new_posts (list[posts_schema.PostCreate]): New posts, at most
+            POSTS_BULK_MAX_ITEMS
+
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
+        current_user (int): Logged in user ID
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [no or too many posts]
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+
+    Returns:
+        list[dict]: Newly created posts, in request order
+    """
+    check_item_count(new_posts, settings.POSTS_BULK_MAX_ITEMS, "posts")
+
+    try:
+        inserted_posts = await posts_model.bulk_create_posts(
+            new_posts, database, current_user
+        )
+        replica_router.record_write(current_user.id)
+        return inserted_posts
+
+    except Exception as error:
+        print("Error:", error)
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Something went wrong!",
+        )
+
+
+@router.put("/bulk", response_model=posts_schema.PostBulkUpdateResponse)
+async def bulk_update_posts(
+    updated_posts: list[posts_schema.PostBulkUpdate],
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
+    current_user: int = Depends(oauth2.get_current_user),
+):
+    """
+    Update many of your posts at once (one UPDATE), posts which don't exist or
+    belong to someone else are skipped
+
+    Args:
+        updated_posts (list[posts_schema.PostBulkUpdate]): Post ids and their new
+            fields, at most POSTS_BULK_MAX_ITEMS
+
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
+        current_user (int): Logged in user ID
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [no, too many or duplicate posts]
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+
+    Returns:
+        dict: Updated posts and skipped ids
+    """
+    check_item_count(updated_posts, settings.POSTS_BULK_MAX_ITEMS, "posts")
+    if len({post.id for post in updated_posts}) != len(updated_posts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Duplicate ids!"
+        )
+
+    try:
+        updated, skipped = await posts_model.bulk_update_posts(
+            updated_posts, database, current_user
+        )
+        replica_router.record_write(current_user.id)
+        return {"updated": updated, "skipped": skipped}
+
+    except Exception as error:
+        print("Error:", error)
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Something went wrong!",
+        )
+
+
+@router.delete("/bulk", response_model=posts_schema.PostBulkDeleteResponse)
+async def bulk_delete_posts(
+    ids: str,
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
+    current_user: int = Depends(oauth2.get_current_user_fresh),
+):
+    """
+    Delete many of your posts at once (one DELETE), posts which don't exist or
+    belong to someone else are skipped
+
+    Args:
+        ids (str): Comma separated post ids, at most POSTS_BULK_MAX_ITEMS
+
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
+        current_user (int): Logged in user ID
+
+    Raises:
+        HTTPException: HTTP_400_BAD_REQUEST [invalid or too many ids]
+        HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
+
+    Returns:
+        dict: Deleted and skipped ids
+    """
+    post_ids = parse_ids(ids, settings.POSTS_BULK_MAX_ITEMS)
+
+    try:
+        deleted, skipped = await posts_model.bulk_delete_posts(
+            post_ids, database, current_user
+        )
+        replica_router.record_write(current_user.id)
+        return {"deleted": deleted, "skipped": skipped}
+
+    except Exception as error:
+        print("Error in post routes:", error)
+
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Something went wrong!",
+        )
+
+
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post(
+async def delete_post(
     post_id: int,
-    database: Session = Depends(connect_to_postgres_db),
-    current_user: int = Depends(oauth2.get_current_user),
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
+    current_user: int = Depends(oauth2.get_current_user_fresh),
 ):
     """
     Delete a post
@@ -150,8 +549,8 @@ def delete_post(
     Args:
         post_id (int): Post ID
 
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
         current_user (int): Logged in user ID
 
     Raises:
@@ -159,7 +558,8 @@ def delete_post(
         HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
     """
     try:
-        posts_model.delete_post(post_id, database, current_user)
+        await posts_model.delete_post(post_id, database, current_user)
+        replica_router.record_write(current_user.id)
         return Response(status_code=status.HTTP_204_NO_CONTENT)
 
     except HTTPException as error:
@@ -175,10 +575,10 @@ def delete_post(
 
 
 @router.put("/{post_id}", response_model=posts_schema.PostData)
-def update_post(
+async def update_post(
     post_id: int,
     updated_post: posts_schema.PostUpdate,
-    database: Session = Depends(connect_to_postgres_db),
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
     current_user: int = Depends(oauth2.get_current_user),
 ):
     """
@@ -188,8 +588,8 @@ def update_post(
         post_id (int): Id of the post
         updated_post (posts_schema.PostUpdate): Post update data field(s) + original fields
 
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
         current_user (int): Logged in user ID
     Raises:
         HTTPException: HTTP_404_NOT_FOUND
@@ -198,9 +598,10 @@ def update_post(
         dict: Response for updated post
     """
     try:
-        updated_post = posts_model.update_post(
+        updated_post = await posts_model.update_post(
             post_id, updated_post, database, current_user
         )
+        replica_router.record_write(current_user.id)
         return updated_post
 
     except HTTPException as error:
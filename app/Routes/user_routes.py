@@ -5,12 +5,15 @@ Routes for USERS related operations
 """
 
 # Imports
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status, APIRouter
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends, Header, HTTPException, Response, status, APIRouter
 
+from app.Utils import etag
 from app.Models import users_model
 from app.schemas import users_schema
-from app.Database.db import connect_to_postgres_db
+from app.Database.db import connect_to_async_postgres_db
+from app.Database.replicas import connect_to_user_read_db, replica_router
 
 # FastAPI Router
 router = APIRouter(prefix="/api/users", tags=["Users"])
@@ -21,25 +24,37 @@ router = APIRouter(prefix="/api/users", tags=["Users"])
 
 
 @router.get("/{user_id}", response_model=users_schema.UserResponse)
-def get_user(user_id: int, database: Session = Depends(connect_to_postgres_db)):
+async def get_user(
+    user_id: int,
+    response: Response,
+    database: AsyncSession = Depends(connect_to_user_read_db),
+    if_none_match: Optional[str] = Header(None),
+):
     """Return user info
 
     Args:
         user_id (int): User id
+        response (Response): Outgoing response, carries the ETag header
 
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_user_read_db).
+        if_none_match (str, Optional): ETag of the client's copy of the user
 
     Raises:
         HTTPException: HTTP_404_NOT_FOUND
         HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
 
     Returns:
-        dict: User info
+        dict: User info (304 Not Modified if the ETag matches)
     """
 
     try:
-        user = users_model.get_user(user_id, database)
+        user = await users_model.get_user(user_id, database)
+
+        tag = etag.user_etag(user)
+        if etag.etag_matches(if_none_match, tag):
+            return etag.not_modified(tag)
+        response.headers["ETag"] = tag
         return user
 
     except HTTPException as error:
@@ -59,9 +74,9 @@ def get_user(user_id: int, database: Session = Depends(connect_to_postgres_db)):
     status_code=status.HTTP_201_CREATED,
     response_model=users_schema.UserResponse,
 )
-def create_user(
+async def create_user(
     new_user: users_schema.UserCreate,
-    database: Session = Depends(connect_to_postgres_db),
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
 ):
     """
     Create a new user
@@ -69,11 +84,12 @@ def create_user(
     Args:
         new_user (users_schema.UserCreate): User request data validator
 
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
 
     Raises:
         HTTPException: HTTP_409_CONFLICT [already exists]
+        HTTPException: HTTP_503_SERVICE_UNAVAILABLE [too many sign ups in progress]
         HTTPException: HTTP_500_INTERNAL_SERVER_ERROR
 
     Returns:
@@ -81,7 +97,8 @@ def create_user(
     """
 
     try:
-        inserted_user = users_model.create_user(new_user, database)
+        inserted_user = await users_model.create_user(new_user, database)
+        replica_router.record_write(inserted_user.id)
         return inserted_user
 
     except HTTPException as error:
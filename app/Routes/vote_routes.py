@@ -5,13 +5,15 @@ Routes for VOTES related operations
 """
 
 # Imports
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status, APIRouter
 
 from app.Utils import oauth2
 from app.Models import votes_model
+from app.Models.vote_buffer import vote_buffer
 from app.schemas import votes_schema
-from app.Database.db import connect_to_postgres_db
+from app.Database.db import connect_to_async_postgres_db
+from app.Database.replicas import replica_router
 
 # FastAPI Router
 router = APIRouter(prefix="/api/vote", tags=["Votes"])
@@ -22,9 +24,9 @@ router = APIRouter(prefix="/api/vote", tags=["Votes"])
 
 
 @router.post("/", status_code=status.HTTP_201_CREATED)
-def add_vote(
+async def add_vote(
     vote: votes_schema.VoteRequest,
-    database: Session = Depends(connect_to_postgres_db),
+    database: AsyncSession = Depends(connect_to_async_postgres_db),
     current_user: int = Depends(oauth2.get_current_user),
 ):
     """
@@ -32,12 +34,17 @@ def add_vote(
 
     Args:
         vote (votes_schema.VoteRequest): Vote info
-        database (Session, optional):
-            Postgres db session object. Defaults to Depends(connect_to_postgres_db).
+        database (AsyncSession, optional):
+            Postgres db session object. Defaults to Depends(connect_to_async_postgres_db).
         current_user (int): Logged in user ID
     """
     try:
-        return votes_model.update_vote(vote, database, current_user)
+        if vote_buffer.enabled:
+            response = await vote_buffer.record(vote, database, current_user)
+        else:
+            response = await votes_model.update_vote(vote, database, current_user)
+        replica_router.record_write(current_user.id)
+        return response
 
     except HTTPException as error:
         raise error
@@ -0,0 +1,79 @@
+# pylint: disable=E0401
+
+"""
+Pick the bcrypt cost (rounds) for a login latency budget on this hardware
+
+Each extra round doubles the hashing time. One hash is timed at a low cost and
+the highest cost that stays within the budget is picked. Run it on the
+production hardware and pin the result in BCRYPT_ROUNDS:
+
+    python -m app.Utils.bcrypt_calibration --target-ms 250
+
+(BCRYPT_ROUNDS=0 calibrates every worker at startup instead, against
+BCRYPT_TARGET_MS. Only do that when all workers run on the same hardware,
+otherwise logins keep rehashing passwords to each worker's cost.)
+"""
+
+# Imports
+import time
+import argparse
+import statistics
+from typing import Callable
+
+from passlib.hash import bcrypt
+
+# bcrypt costs considered (below 10 is too cheap to brute force, 31 is bcrypt's max)
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+
+
+def hash_time(rounds: int, samples: int = 3) -> float:
+    """
+    Time one bcrypt hash at the given cost
+
+    Args:
+        rounds (int): bcrypt cost
+        samples (int): Hashes to time, the median is kept
+
+    Returns:
+        float: Milliseconds per hash
+    """
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        bcrypt.using(rounds=rounds).hash("calibration password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_rounds(
+    target_ms: float, measure: Callable[[int], float] = hash_time
+) -> int:
+    """
+    Highest bcrypt cost whose hashing time fits the budget
+
+    Args:
+        target_ms (float): Budget for one hash/verify, in milliseconds
+        measure (Callable, optional): Milliseconds per hash at a given cost
+
+    Returns:
+        int: Rounds, between MIN_ROUNDS and MAX_ROUNDS
+    """
+    base_ms = measure(MIN_ROUNDS)
+
+    rounds = MIN_ROUNDS
+    while rounds < MAX_ROUNDS and base_ms * 2 ** (rounds + 1 - MIN_ROUNDS) <= target_ms:
+        rounds += 1
+    return rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--target-ms", type=float, default=250)
+    args = parser.parse_args()
+
+    calibrated = calibrate_rounds(args.target_ms)
+    print(
+        f"BCRYPT_ROUNDS={calibrated} "
+        f"(~{hash_time(calibrated, samples=1):.0f} ms per hash on this machine)"
+    )
@@ -0,0 +1,210 @@
+"""
+In-process TTL + LRU cache bounded by an (approximate) byte budget
+"""
+
+# Imports
+import sys
+import time
+from datetime import date, datetime
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+# Returned by TTLCache.get when the key isn't cached
+MISSING = object()
+
+
+def approximate_size(value: Any) -> int:
+    """
+    Approximate memory used by a value made of dicts, lists and scalars
+
+    Args:
+        value (Any): Value to measure
+
+    Returns:
+        int: Size in bytes
+    """
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(
+            approximate_size(key) + approximate_size(item)
+            for key, item in value.items()
+        )
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(approximate_size(item) for item in value)
+    elif not isinstance(value, (str, bytes, int, float, bool, date, datetime)):
+        size += approximate_size(vars(value)) if hasattr(value, "__dict__") else 0
+
+    return size
+
+
+class CacheEntry:
+    """A cached value along with its bookkeeping"""
+
+    __slots__ = ("value", "size", "expires_at", "tags")
+
+    def __init__(self, value: Any, size: int, expires_at: float, tags: frozenset):
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        self.tags = tags
+
+
+class TTLCache:
+    """
+    Entries expire `ttl` seconds after they are set, and the least recently used
+    ones are evicted once the cache holds more than `max_bytes`.
+
+    Entries can carry tags (e.g. the ids of the rows they were built from) to be
+    invalidated together. Not thread safe, meant to be used from the event loop.
+    """
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.version = 0  # bumped by every invalidation
+        self.size = 0
+
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._tags: dict[Hashable, set] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Is caching turned on?"""
+        return self.ttl > 0 and self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Cached value of the key
+
+        Args:
+            key (Hashable): Cache key
+
+        Returns:
+            Any: Cached value, or MISSING
+        """
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return MISSING
+
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[Hashable] = (),
+        version: Optional[int] = None,
+        ttl: Optional[float] = None,
+    ):
+        """
+        Cache a value
+
+        Args:
+            key (Hashable): Cache key
+            value (Any): Value to cache
+            tags (Iterable[Hashable]): Tags to invalidate the entry by
+            version (int, Optional): `version` read before the value was loaded,
+                the value isn't cached if anything got invalidated in between
+            ttl (float, Optional): Expire the entry sooner than the cache's `ttl`
+        """
+        if not self.enabled or (version is not None and version != self.version):
+            return
+
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+
+        size = approximate_size(value)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+
+        tags = frozenset(tags)
+        self._entries[key] = CacheEntry(
+            value, size, time.monotonic() + ttl, tags
+        )
+        self.size += size
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while self.size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    # ------------------------------- Invalidation ------------------------------- #
+    def invalidate(self, key: Hashable):
+        """Drop a single entry"""
+        self.version += 1
+        if key in self._entries:
+            self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_tag(self, tag: Hashable):
+        """Drop every entry carrying the tag"""
+        self.version += 1
+        for key in list(self._tags.get(tag, ())):
+            self._remove(key)
+            self.invalidations += 1
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]):
+        """Drop every entry whose key matches the predicate"""
+        self.version += 1
+        for key in [key for key in self._entries if predicate(key)]:
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self):
+        """Drop everything"""
+        self.invalidate_where(lambda key: True)
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+        for tag in entry.tags:
+            keys = self._tags[tag]
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
+
+    # ---------------------------------- Metrics --------------------------------- #
+    def stats(self) -> dict:
+        """
+        Cache counters
+
+        Returns:
+            dict: Hits, misses, evictions, expirations, invalidations and size
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
@@ -5,10 +5,32 @@ Methods related to hashing
 """
 
 # Imports
+import asyncio
+import hashlib
+import threading
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-# Default hashing algorithm to use
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.settings import settings
+from app.Utils.bcrypt_calibration import calibrate_rounds
+
+# App Settings
+settings = settings.Settings()
+
+# bcrypt cost of new hashes, stored hashes of another cost are redone at login
+BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS or calibrate_rounds(settings.BCRYPT_TARGET_MS)
+
+# Default hashing algorithm to use, hashes of any other cost need an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 
 def hash_password(password: str):
@@ -36,3 +58,140 @@ def verify(plain_pass, hashed_pass):
         bool: Does both password hash matches
     """
     return pwd_context.verify(plain_pass, hashed_pass)
+
+
+def verify_and_update(plain_pass, hashed_pass):
+    """
+    Verify plain password matches db user password, and rehash it if the stored
+    hash doesn't use the current cost (BCRYPT_ROUNDS)
+
+    Args:
+        plain_pass (str): Plain request input password
+        hashed_pass (str): Password from the DB
+
+    Returns:
+        tuple[bool, str]: Does both password hash matches, new hash to store (None
+            when the stored one is up to date)
+    """
+    return pwd_context.verify_and_update(plain_pass, hashed_pass)
+
+
+def hash_refresh_token(token: str):
+    """
+    Hash a refresh token to store/look it up (tokens are random, a fast hash is
+    enough, no need for bcrypt)
+
+    Args:
+        token (str): Refresh token
+
+    Returns:
+        str: sha256 hex digest
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a process pool of `max_workers` processes, so a burst of
+    logins/sign-ups neither holds the GIL nor fills the threadpool other routes
+    use. At most `queue_limit` calls wait for a free process, further calls are
+    rejected with 503 and a Retry-After header.
+    """
+
+    def __init__(self, max_workers: int, queue_limit: int, retry_after: int):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        self.in_flight = 0  # running + queued
+        self.completed = 0
+        self.rejected = 0
+        # in_flight is decremented from the pool's management thread
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """Process pool, started on first use"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, function, *args):
+        """
+        Run a bcrypt function in the pool
+
+        Raises:
+            HTTPException: HTTP_503_SERVICE_UNAVAILABLE [pool and queue are full]
+
+        Returns:
+            Any: Result of the function
+        """
+        if self.in_flight >= self.max_workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many requests, try again later!",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        with self._lock:
+            self.in_flight += 1
+        try:
+            future = self.executor.submit(function, *args)
+        except BaseException:
+            self.done()
+            raise
+
+        # Counted until the pool is done with it, even if the caller goes away
+        # (client disconnect) while the process is still hashing
+        future.add_done_callback(lambda _: self.done())
+        return await asyncio.wrap_future(future)
+
+    def done(self):
+        """A call left the pool (finished, failed or cancelled before it ran)"""
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        """hash_password in the pool"""
+        return await self.run(hash_password, password)
+
+    async def verify(self, plain_pass: str, hashed_pass: str) -> bool:
+        """verify in the pool"""
+        return await self.run(verify, plain_pass, hashed_pass)
+
+    async def verify_and_update(self, plain_pass: str, hashed_pass: str) -> tuple:
+        """verify_and_update in the pool"""
+        return await self.run(verify_and_update, plain_pass, hashed_pass)
+
+    def shutdown(self):
+        """Stop the pool's processes (on app shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    # ---------------------------------- Metrics --------------------------------- #
+    def stats(self) -> dict:
+        """
+        Pool metrics
+
+        Returns:
+            dict: Running and queued calls, completed and rejected calls
+        """
+        return {
+            "max_workers": self.max_workers,
+            "queue_limit": self.queue_limit,
+            "running": min(self.in_flight, self.max_workers),
+            "queued": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(
+    settings.PASSWORD_HASH_WORKERS,
+    settings.PASSWORD_HASH_QUEUE_LIMIT,
+    settings.PASSWORD_HASH_RETRY_AFTER,
+)
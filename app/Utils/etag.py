@@ -0,0 +1,124 @@
+"""
+ETags and conditional GET (If-None-Match) helpers
+
+ETags are weak validators built from the fields a representation changes with
+(id, last modification time, vote count), so they are computed without
+serializing the body.
+"""
+
+# Imports
+import hashlib
+from typing import Iterable, Mapping, Optional
+
+from fastapi import Response, status
+
+
+def _changed_at(data) -> str:
+    """Last modification time of a post/user dict or object"""
+    if isinstance(data, dict):
+        changed_at = data.get("updated_at") or data["created_at"]
+    else:
+        changed_at = data.updated_at or data.created_at
+    return changed_at.isoformat()
+
+
+def post_version(post: dict) -> str:
+    """Version of a {"Post", "votes"} post"""
+    return f"{post['Post']['id']}-{_changed_at(post['Post'])}-{post['votes']}"
+
+
+def post_etag(post: dict) -> str:
+    """
+    ETag of a single post
+
+    Args:
+        post (dict): {"Post", "votes"} post
+
+    Returns:
+        str: Weak ETag
+    """
+    return f'W/"{post_version(post)}"'
+
+
+def posts_etag(posts: Iterable[dict]) -> str:
+    """
+    ETag of a page of posts (changes when any post of the window changes)
+
+    Args:
+        posts (Iterable[dict]): {"Post", "votes"} posts
+
+    Returns:
+        str: Weak ETag
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for post in posts:
+        digest.update(post_version(post).encode())
+        digest.update(b";")
+    return f'W/"{digest.hexdigest()}"'
+
+
+def body_etag(body: bytes) -> str:
+    """
+    ETag of an already rendered body (for representations without a version)
+
+    Args:
+        body (bytes): Response body
+
+    Returns:
+        str: Weak ETag
+    """
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def user_etag(user) -> str:
+    """
+    ETag of a user
+
+    Args:
+        user (User): User object
+
+    Returns:
+        str: Weak ETag
+    """
+    return f'W/"{user.id}-{_changed_at(user)}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Does the If-None-Match header match the ETag? (weak comparison)
+
+    Args:
+        if_none_match (str, Optional): If-None-Match request header
+        etag (str): Current ETag of the resource
+
+    Returns:
+        bool: The client's copy is up to date
+    """
+    if not if_none_match:
+        return False
+
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified(etag: str, headers: Optional[Mapping[str, str]] = None) -> Response:
+    """
+    Empty 304 Not Modified response
+
+    Args:
+        etag (str): Current ETag of the resource
+        headers (Mapping, Optional): Other headers the 200 response would carry
+
+    Returns:
+        Response: 304 response
+    """
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={**(headers or {}), "ETag": etag},
+    )
@@ -0,0 +1,251 @@
+# pylint: disable=E0401, C0415, R0903
+
+"""
+Interchangeable JWT encode/decode backends (JWT_BACKEND setting)
+
+    hmac    minimal stdlib codec, HS256/HS384/HS512 only (default)
+    jose    python-jose
+    pyjwt   PyJWT
+
+Every backend takes and returns plain claims dicts (exp/iat/nbf as epoch
+seconds), checks exp and nbf, and raises InvalidTokenError for any token it
+won't accept. tests/test_jwt_backends.py is the conformance suite they all pass,
+`python -m benchmarks.jwt_backends` compares their speed.
+"""
+
+# Imports
+import hmac
+import json
+import time
+import base64
+import hashlib
+
+
+class InvalidTokenError(Exception):
+    """Malformed, forged, expired or not yet valid token"""
+
+
+class JWTBackend:
+    """Encode/decode claims as a signed JWT with one key and algorithm"""
+
+    name = ""
+
+    def __init__(self, secret_key: str, algorithm: str):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+
+    def encode(self, claims: dict) -> str:
+        """
+        Sign the claims
+
+        Args:
+            claims (dict): JSON serializable claims
+
+        Returns:
+            str: Compact JWT
+        """
+        raise NotImplementedError
+
+    def decode(self, token: str) -> dict:
+        """
+        Verify the token and return its claims
+
+        Args:
+            token (str): Compact JWT
+
+        Raises:
+            InvalidTokenError: Token isn't valid
+
+        Returns:
+            dict: Claims
+        """
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------------------- #
+#                                   Backends                                   #
+# ---------------------------------------------------------------------------- #
+
+
+class JoseBackend(JWTBackend):
+    """python-jose"""
+
+    name = "jose"
+
+    def __init__(self, secret_key: str, algorithm: str):
+        super().__init__(secret_key, algorithm)
+        from jose import JWTError, jwt
+
+        self._jwt = jwt
+        self._error = JWTError
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        check_encoding(token)
+        try:
+            return self._jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except self._error as error:
+            raise InvalidTokenError(str(error)) from error
+
+
+class PyJWTBackend(JWTBackend):
+    """PyJWT"""
+
+    name = "pyjwt"
+
+    def __init__(self, secret_key: str, algorithm: str):
+        super().__init__(secret_key, algorithm)
+        import jwt
+
+        self._jwt = jwt
+
+    def encode(self, claims: dict) -> str:
+        return self._jwt.encode(claims, self.secret_key, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> dict:
+        check_encoding(token)
+        try:
+            return self._jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+        except self._jwt.PyJWTError as error:
+            raise InvalidTokenError(str(error)) from error
+
+
+def b64url_encode(data: bytes) -> bytes:
+    """base64url without padding"""
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def b64url_decode(data: bytes) -> bytes:
+    """
+    Strict base64url: no padding, nothing outside the alphabet, unused bits
+    zero, so every value has a single valid encoding
+
+    Args:
+        data (bytes): Encoded data
+
+    Raises:
+        ValueError: Not the canonical encoding of anything
+
+    Returns:
+        bytes: Decoded data
+    """
+    # The stdlib decoder skips unknown characters and ignores the unused bits,
+    # anything which doesn't encode back to the input was one of those
+    decoded = base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+    if b64url_encode(decoded) != data:
+        raise ValueError("Non canonical base64url")
+    return decoded
+
+
+def check_encoding(token: str):
+    """
+    Refuse tokens whose segments aren't strict base64url (python-jose and PyJWT
+    decode them as leniently as the stdlib)
+
+    Args:
+        token (str): Compact JWT
+
+    Raises:
+        InvalidTokenError: A segment isn't strict base64url
+    """
+    try:
+        for segment in token.encode().split(b"."):
+            b64url_decode(segment)
+    except (ValueError, AttributeError) as error:
+        raise InvalidTokenError("Malformed token") from error
+
+
+class HmacBackend(JWTBackend):
+    """HS256/HS384/HS512 with the standard library only"""
+
+    name = "hmac"
+
+    DIGESTS = {
+        "HS256": hashlib.sha256,
+        "HS384": hashlib.sha384,
+        "HS512": hashlib.sha512,
+    }
+
+    def __init__(self, secret_key: str, algorithm: str):
+        super().__init__(secret_key, algorithm)
+        if algorithm not in self.DIGESTS:
+            raise ValueError(f"The hmac JWT backend doesn't support {algorithm}")
+
+        self._key = secret_key.encode()
+        self._digest = self.DIGESTS[algorithm]
+        # Every token has the same header, encode it once
+        self._header = b64url_encode(
+            json.dumps(
+                {"alg": algorithm, "typ": "JWT"}, separators=(",", ":")
+            ).encode()
+        )
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        return hmac.new(self._key, signing_input, self._digest).digest()
+
+    def encode(self, claims: dict) -> str:
+        payload = b64url_encode(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = self._header + b"." + payload
+        return (signing_input + b"." + b64url_encode(self._sign(signing_input))).decode()
+
+    def decode(self, token: str) -> dict:
+        try:
+            signing_input, _, signature = token.encode().rpartition(b".")
+            header, _, payload = signing_input.partition(b".")
+
+            if not hmac.compare_digest(
+                self._sign(signing_input), b64url_decode(signature)
+            ):
+                raise InvalidTokenError("Signature verification failed")
+
+            # The signature covers the header, but only trust our own algorithm
+            if header != self._header and (
+                json.loads(b64url_decode(header)).get("alg") != self.algorithm
+            ):
+                raise InvalidTokenError("The specified alg value is not allowed")
+
+            claims = json.loads(b64url_decode(payload))
+
+        except (ValueError, TypeError, AttributeError) as error:
+            raise InvalidTokenError("Malformed token") from error
+
+        if not isinstance(claims, dict):
+            raise InvalidTokenError("Invalid payload")
+
+        now = time.time()
+        for claim in ("exp", "nbf", "iat"):
+            if claim in claims and not isinstance(claims[claim], (int, float)):
+                raise InvalidTokenError(f"Invalid {claim} claim")
+        if "exp" in claims and claims["exp"] <= now:
+            raise InvalidTokenError("Signature has expired")
+        if "nbf" in claims and claims["nbf"] > now:
+            raise InvalidTokenError("The token is not yet valid (nbf)")
+
+        return claims
+
+
+BACKENDS = {
+    backend.name: backend for backend in (JoseBackend, PyJWTBackend, HmacBackend)
+}
+
+
+def get_backend(name: str, secret_key: str, algorithm: str) -> JWTBackend:
+    """
+    Backend by its name
+
+    Args:
+        name (str): jose, pyjwt or hmac
+        secret_key (str): Signing key
+        algorithm (str): Signing algorithm, e.g. HS256
+
+    Raises:
+        ValueError: Unknown backend, or algorithm it doesn't support
+
+    Returns:
+        JWTBackend: Backend instance
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JWT backend {name!r}, pick one of {list(BACKENDS)}")
+    return BACKENDS[name](secret_key, algorithm)
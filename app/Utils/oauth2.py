@@ -5,20 +5,33 @@ JWT auth operations
 """
 
 # Imports
-from datetime import datetime, timedelta
+import time
+import uuid
+import hashlib
 
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, status, HTTPException
 from fastapi.security.oauth2 import OAuth2PasswordBearer
 
 from app.Database import db
+from app.Models import users_model
+from app.Models.token_revocations import revocation_list
 from app.schemas import users_schema
 from app.settings import settings
+from app.Utils.cache import MISSING, TTLCache
+from app.Utils.jwt_backends import InvalidTokenError, get_backend
 
 # App Settings
 settings = settings.Settings()
 
+# Token encode/decode implementation
+jwt_backend = get_backend(
+    settings.JWT_BACKEND, settings.JWT_SECRET_KEY, settings.JWT_ALOGORITHM
+)
+
+# Verified tokens by digest, each expires with its token (per worker process)
+tokens_cache = TTLCache(settings.TOKENS_CACHE_TTL, settings.TOKENS_CACHE_MAX_BYTES)
+
 # Look on ENDPOINT for bearer tokens
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -36,19 +49,23 @@ def create_access_token(data: dict):
 
     to_encode = data.copy()
 
-    expire = datetime.utcnow() + timedelta(
-        minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-    )
-    to_encode.update({"exp": expire})
+    issued_at = int(time.time())
+    expire = issued_at + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    # jti/iat let a single token, or all the user's tokens up to now, be revoked
+    to_encode.update({"exp": expire, "iat": issued_at, "jti": uuid.uuid4().hex})
 
-    return jwt.encode(
-        to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALOGORITHM
-    )
+    return jwt_backend.encode(to_encode)
+
+
+def token_digest(token: str) -> bytes:
+    """Key of a token in the verified tokens cache"""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
 
 
 def verify_access_token(token: str, credentials_exceptions):
     """
-    Verify a JWT access token
+    Verify a JWT access token, tokens already verified are served from the cache
+    until they expire. Revoked tokens are refused
 
     Args:
         token (str): Access token
@@ -57,27 +74,104 @@ def verify_access_token(token: str, credentials_exceptions):
     Returns:
         app.Models.users_schema.TokenData: Decoded token data (user_id)
     """
-    try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET_KEY, algorithms=settings.JWT_ALOGORITHM
+    key = token_digest(token)
+    token_data = tokens_cache.get(key)
+
+    if token_data is MISSING:
+        token_data = decode_access_token(token, credentials_exceptions)
+        tokens_cache.set(
+            key,
+            token_data,
+            ttl=None if token_data.exp is None else token_data.exp - time.time(),
         )
 
+    # Revocations apply to cached tokens too
+    if revocation_list.is_revoked(token_data):
+        raise credentials_exceptions
+    return token_data
+
+
+def decode_access_token(token: str, credentials_exceptions):
+    """
+    Check the signature and expiry of a JWT access token and decode it
+
+    Args:
+        token (str): Access token
+        credentials_exceptions (Exception): Exception to raise for unauthorization
+
+    Returns:
+        app.Models.users_schema.TokenData: Decoded token data
+    """
+    try:
+        payload = jwt_backend.decode(token)
+
         user_id: str = payload.get("user_id")
 
         if user_id is None:
             raise credentials_exceptions
 
-        token_data = users_schema.TokenData(id=user_id)
-        return token_data
+        return users_schema.TokenData(
+            id=user_id,
+            jti=payload.get("jti"),
+            iat=payload.get("iat"),
+            exp=payload.get("exp"),
+        )
 
-    except JWTError as error:
+    except InvalidTokenError as error:
         print("JWT error!", error)
         raise credentials_exceptions from error
 
 
-def get_current_user(
+def credentials_exception():
+    """401 raised for missing, invalid, expired or revoked tokens"""
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def get_current_token(token: str = Depends(oauth2_scheme)):
+    """
+    Verified (and not revoked) access token of the request
+
+    Args:
+        token (str, optional): JWT access token. Defaults to Depends(oauth2_scheme).
+
+    Returns:
+        app.schemas.users_schema.TokenData: Decoded token data
+    """
+    return verify_access_token(token, credentials_exception())
+
+
+async def resolve_user(token: str, database: AsyncSession, fresh: bool):
+    """
+    Verify the token and get its user
+
+    Args:
+        token (str): JWT access token
+        database (AsyncSession): Database session
+        fresh (bool): Look the user up in the database instead of the users cache
+
+    Raises:
+        HTTPException: HTTP_401_UNAUTHORIZED
+
+    Returns:
+        app.schemas.users_schema.UserResponse: Logged in user (id, email, created_at)
+    """
+    credentials_exceptions = credentials_exception()
+
+    token = verify_access_token(token, credentials_exceptions)
+    user = await users_model.get_authenticated_user(int(token.id), database, fresh)
+
+    if user is None:
+        raise credentials_exceptions
+    return user
+
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    database: Session = Depends(db.connect_to_postgres_db),
+    database: AsyncSession = Depends(db.connect_to_async_postgres_db),
 ):
     """
     Check if token is valid or not else raise an error
@@ -85,14 +179,20 @@ def get_current_user(
     Args:
         token (str, optional): JWT access token. Defaults to Depends(oauth2_scheme).
     """
+    return await resolve_user(token, database, fresh=False)
 
-    credentials_exceptions = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
 
-    token = verify_access_token(token, credentials_exceptions)
-    return (
-        database.query(users_schema.User).filter(users_schema.User.id == token.id).first()
+async def get_current_user_fresh(
+    token: str = Depends(oauth2_scheme),
+    database: AsyncSession = Depends(db.connect_to_async_postgres_db),
+):
+    """
+    get_current_user for sensitive routes, the user is looked up in the database
+    (unless AUTH_FRESH_USER_FOR_SENSITIVE_ROUTES is off)
+
+    Args:
+        token (str, optional): JWT access token. Defaults to Depends(oauth2_scheme).
+    """
+    return await resolve_user(
+        token, database, fresh=settings.AUTH_FRESH_USER_FOR_SENSITIVE_ROUTES
     )
@@ -0,0 +1,54 @@
+"""
+Opaque cursors for keyset pagination
+"""
+
+# Imports
+import json
+import base64
+from datetime import datetime
+from typing import Any, Callable
+
+
+class InvalidCursorException(Exception):
+    """Cursor couldn't be decoded"""
+
+
+def encode_cursor(*key: Any) -> str:
+    """
+    Encode the sort key of the last row of a page, e.g. (created_at, id)
+
+    Args:
+        key (Any): Sort key values (json serializable or datetime)
+
+    Returns:
+        str: URL safe cursor
+    """
+    raw = json.dumps(key, separators=(",", ":"), default=datetime.isoformat)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: Callable) -> tuple:
+    """
+    Decode a cursor made by encode_cursor
+
+    Args:
+        cursor (str): Cursor from a previous page
+        types (Callable): Converter for each key value, e.g. datetime.fromisoformat
+
+    Raises:
+        InvalidCursorException: Cursor is malformed
+
+    Returns:
+        tuple: Sort key of the last row of the previous page
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded))
+
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Cursor doesn't match the sort key")
+
+        return tuple(convert(value) for convert, value in zip(types, values))
+
+    except (ValueError, TypeError) as error:
+        raise InvalidCursorException(cursor) from error
@@ -0,0 +1,306 @@
+# pylint: disable=E0401, R0903, R0902
+
+"""
+Rate limiting and admission control
+
+Every request takes a token from its client IP's bucket and, with a valid bearer
+token, from its user's bucket too. Buckets refill at `rate` tokens per second up
+to `burst`, per route group (RATE_LIMIT_ROUTES, longest path prefix wins,
+RATE_LIMIT_RATE/RATE_LIMIT_BURST otherwise). If either bucket is empty the
+request gets a 429 and takes nothing from the other one, so neither many tokens
+from one IP nor one token from many IPs gets around the limits.
+
+The client IP is the one uvicorn reports, behind a proxy start it with
+--proxy-headers and the proxy's address in --forwarded-allow-ips (see Procfile
+and gunicorn.service) or every client shares the proxy's bucket.
+
+On top of that at most MAX_IN_FLIGHT_REQUESTS requests are served at once.
+Up to ADMISSION_MAX_QUEUE more wait for a slot, for at most
+ADMISSION_QUEUE_TIMEOUT_MS; requests which would wait longer (or find the queue
+full) get a 503 right away instead of queueing past the latency budget.
+
+Limiter state is per worker process and bounded: the least recently seen
+clients are forgotten past RATE_LIMIT_MAX_CLIENTS.
+"""
+
+# Imports
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from fastapi import HTTPException
+
+from app.Utils import oauth2
+from app.settings import settings
+
+# App Settings
+settings = settings.Settings()
+
+
+class TokenBuckets:
+    """Token bucket per key, the least recently used keys beyond `max_keys` are
+    dropped (a dropped key starts again with a full bucket)"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> (tokens, last refill time)
+        self._buckets: "OrderedDict[Hashable, tuple[float, float]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: Hashable, rate: float, burst: int) -> float:
+        """
+        Take a token from the key's bucket
+
+        Args:
+            key (Hashable): Client (and route group) key
+            rate (float): Tokens added per second
+            burst (int): Bucket size
+
+        Returns:
+            float: 0 if a token was taken, else seconds until one is available
+        """
+        return self.take_all([key], rate, burst)
+
+    def take_all(self, keys: list, rate: float, burst: int) -> float:
+        """
+        Take a token from the bucket of every key, only if each of them has one
+        (a request refused by one bucket doesn't drain the others)
+
+        Args:
+            keys (list): Client (and route group) keys
+            rate (float): Tokens added per second
+            burst (int): Bucket size
+
+        Returns:
+            float: 0 if the tokens were taken, else seconds until every bucket
+                has one
+        """
+        now = time.monotonic()
+        buckets = {}
+        for key in keys:
+            tokens, updated_at = self._buckets.pop(key, (burst, now))
+            buckets[key] = min(burst, tokens + (now - updated_at) * rate)
+
+        wait = max(
+            [(1 - tokens) / rate for tokens in buckets.values() if tokens < 1],
+            default=0.0,
+        )
+
+        for key, tokens in buckets.items():
+            self._buckets[key] = (tokens if wait else tokens - 1, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        """Forget every bucket"""
+        self._buckets.clear()
+
+
+class AdmissionControl:
+    """Limits shared by every request of this worker process"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        routes: dict,
+        max_clients: int,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        exempt: list,
+    ):
+        self.rate = rate
+        self.burst = burst
+        # Longest prefixes first
+        self.routes = sorted(routes.items(), key=lambda route: -len(route[0]))
+        self.buckets = TokenBuckets(max_clients)
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.exempt = tuple(exempt)
+
+        self.in_flight = 0
+        self.queued = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        self.limited = 0
+        self.shed = 0
+
+    def limits(self, path: str) -> tuple[str, float, int]:
+        """Route group, rate and burst of a path"""
+        for prefix, (rate, burst) in self.routes:
+            if path.startswith(prefix):
+                return prefix, rate, burst
+        return "", self.rate, self.burst
+
+    def take(self, path: str, clients: list) -> float:
+        """
+        Take a token for the request from the bucket of each of its clients,
+        or from none of them if any is empty
+
+        Args:
+            path (str): Request path
+            clients (list): Client keys (IP, user) the request is charged to
+
+        Returns:
+            float: 0 if the request may go on, else seconds to wait (Retry-After)
+        """
+        group, rate, burst = self.limits(path)
+        wait = self.buckets.take_all(
+            [(group, client) for client in clients], rate, burst
+        )
+        if wait:
+            self.limited += 1
+        return wait
+
+    async def admit(self) -> bool:
+        """
+        Wait for an in-flight slot, within the queue limit and timeout
+
+        Returns:
+            bool: Admitted (call `release` once served), else shed
+        """
+        if self.max_in_flight <= 0:  # no cap
+            self.in_flight += 1
+            return True
+
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+
+        if self._slots.locked() and self.queued >= self.max_queue:
+            self.shed += 1
+            return False
+
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.shed += 1
+            return False
+        finally:
+            self.queued -= 1
+
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        """Free the slot of a served request"""
+        self.in_flight -= 1
+        if self._slots is not None:
+            self._slots.release()
+
+    def clear(self):
+        """Reset limiter state"""
+        self.buckets.clear()
+        self._slots = None
+        self.in_flight = 0
+        self.queued = 0
+
+    # ---------------------------------- Metrics --------------------------------- #
+    def stats(self) -> dict:
+        """
+        Admission metrics
+
+        Returns:
+            dict: In-flight and queued requests, rate limited and shed requests
+        """
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "clients": len(self.buckets),
+            "limited": self.limited,
+            "shed": self.shed,
+        }
+
+
+admission = AdmissionControl(
+    settings.RATE_LIMIT_RATE,
+    settings.RATE_LIMIT_BURST,
+    settings.RATE_LIMIT_ROUTES,
+    settings.RATE_LIMIT_MAX_CLIENTS,
+    settings.MAX_IN_FLIGHT_REQUESTS,
+    settings.ADMISSION_MAX_QUEUE,
+    settings.ADMISSION_QUEUE_TIMEOUT_MS / 1000,
+    settings.RATE_LIMIT_EXEMPT,
+)
+
+
+# ---------------------------------------------------------------------------- #
+#                                  Middleware                                  #
+# ---------------------------------------------------------------------------- #
+
+
+def client_keys(scope) -> list:
+    """Client IP, and the user id of a valid bearer token"""
+    client = scope.get("client")
+    keys = [("ip", client[0] if client else None)]
+
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                try:
+                    token_data = oauth2.verify_access_token(
+                        token, HTTPException(status_code=401)
+                    )
+                    keys.append(("user", token_data.id))
+                except HTTPException:
+                    pass
+            break
+
+    return keys
+
+
+async def reject(send, status_code: int, detail: str, retry_after: float):
+    """Send an error response with a Retry-After header"""
+    body = json.dumps({"detail": detail}).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, round(retry_after))).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying the rate limits and the in-flight cap"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or not settings.RATE_LIMIT_ENABLED
+            or scope["path"].startswith(admission.exempt)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        wait = admission.take(scope["path"], client_keys(scope))
+        if wait:
+            await reject(send, 429, "Too many requests!", wait)
+            return
+
+        if not await admission.admit():
+            await reject(send, 503, "Server busy, try again later!", 1)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
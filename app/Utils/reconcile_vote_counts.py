@@ -0,0 +1,45 @@
+# pylint: disable=E0401
+
+"""
+Repair "posts.vote_count" values which drifted from the "votes" table
+
+Votes removed by a cascade (e.g. a deleted user) or written outside the API don't
+update the denormalized counter. Run this to bring the counters back in sync:
+
+    python -m app.Utils.reconcile_vote_counts
+"""
+
+# Imports
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.Database import db
+from app.Models import posts_model
+
+
+def reconcile_vote_counts(database: Session) -> list[int]:
+    """
+    Recount the votes of every post and fix the ones that differ
+
+    Args:
+        database (Session): Database session
+
+    Returns:
+        list[int]: Ids of the repaired posts
+    """
+    # Hold off vote writes (reads still go through) so counts can't change
+    # between counting and updating
+    database.execute(text("LOCK TABLE votes IN SHARE MODE"))
+    repaired = database.execute(posts_model.reconcile_vote_counts_query()).scalars()
+    repaired = list(repaired)
+    database.commit()
+    return repaired
+
+
+if __name__ == "__main__":
+    session = db.session_local()
+    try:
+        post_ids = reconcile_vote_counts(session)
+        print(f"Repaired vote count of {len(post_ids)} post(s):", post_ids)
+    finally:
+        session.close()
@@ -7,11 +7,26 @@ FastAPI API application
 # imports
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.Routes import post_routes, user_routes, auth_routes, vote_routes
+from app.Database.query_counter import StatementCountMiddleware
+from app.Database.replicas import ReadYourWritesMiddleware
+from app.Utils.rate_limit import AdmissionControlMiddleware
+from app.Models.vote_buffer import vote_buffer
+from app.Models.token_revocations import revocation_list
+from app.Utils.crypt import password_hasher
+from app.Routes import (
+    post_routes,
+    user_routes,
+    auth_routes,
+    vote_routes,
+    internal_routes,
+)
 
 # Init API
 app = FastAPI()
 
+# Rate limits and in-flight cap (inside CORS, so rejections carry its headers)
+app.add_middleware(AdmissionControlMiddleware)
+
 # CORS Policy
 origins = ["*"]
 app.add_middleware(
@@ -20,13 +35,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Retry-After"],
 )
+app.add_middleware(StatementCountMiddleware)
+
+# Read-your-writes across workers (write cookie)
+app.add_middleware(ReadYourWritesMiddleware)
 
 # Register Routes
 app.include_router(post_routes.router)
 app.include_router(user_routes.router)
 app.include_router(auth_routes.router)
 app.include_router(vote_routes.router)
+app.include_router(internal_routes.router)
+
+# Flush buffered votes in the background, and what is left on shutdown
+app.add_event_handler("startup", vote_buffer.start)
+app.add_event_handler("shutdown", vote_buffer.stop)
+app.add_event_handler("shutdown", password_hasher.shutdown)
+
+# Load the token revocation log and keep following it
+app.add_event_handler("startup", revocation_list.start)
+app.add_event_handler("shutdown", revocation_list.stop)
 
 # ---------------------------------------------------------------------------- #
 #                               Universal Routes                               #
@@ -5,13 +5,16 @@ Schema and validators for "Post" data
 """
 
 # Imports
+from enum import Enum
+from typing import Optional
 from datetime import datetime
 from pydantic import BaseModel
 
 from sqlalchemy.sql.expression import text
 from sqlalchemy.sql.sqltypes import TIMESTAMP
-from sqlalchemy.orm import relationship
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy.orm import deferred, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy import Boolean, Column, Computed, ForeignKey, Index, Integer, String
 
 from app.Database import db
 from app.schemas.users_schema import UserResponse
@@ -37,14 +40,50 @@ class Post(db.base):
     )
     updated_at = Column(TIMESTAMP(timezone=True), server_default=text("NULL"))
     owner_id = Column(
-        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    # Denormalized count of "votes" rows, kept in sync by votes_model.update_vote
+    vote_count = Column(Integer, nullable=False, server_default="0")
+    # Full text search document, generated by postgres (never loaded by default)
+    search_vector = deferred(
+        Column(
+            TSVECTOR,
+            Computed("to_tsvector('english', title || ' ' || content)", persisted=True),
+        )
     )
     owner = relationship("User")
 
+    # Indexes
+    # (pg_trgm indexes for substring search need the extension, they are created
+    # by the alembic migration only)
+    __table_args__ = (
+        # Keyset pagination, ORDER BY created_at DESC, id DESC (backward scan)
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
 
 # ---------------------------------------------------------------------------- #
 #                          Pydantic request validators                         #
 # ---------------------------------------------------------------------------- #
+class SearchMode(str, Enum):
+    """How the `search` query param matches posts"""
+
+    TITLE = "title"  # title contains the string (case sensitive)
+    FULLTEXT = "fulltext"  # ranked full text search over title + content
+    SUBSTRING = "substring"  # title or content contains the string (any case)
+
+
+class PostView(str, Enum):
+    """Which post fields GET /api/posts/ sends"""
+
+    FULL = "full"  # the post, its owner and votes (PostResponse)
+    SUMMARY = "summary"  # no content, a short excerpt of it instead (PostSummary)
+
+
 class PostBase(BaseModel):
     """Data validation for POSTS"""
 
@@ -61,6 +100,12 @@ class PostUpdate(PostBase):
     """UPDATE Post request data validator"""
 
 
+class PostBulkUpdate(PostBase):
+    """Bulk UPDATE Post request data validator"""
+
+    id: int
+
+
 class PostData(PostBase):
     """Post data fetched from database along with joins data validator"""
 
@@ -81,3 +126,39 @@ class PostResponse(BaseModel):
 
     Post: PostData
     votes: int
+
+
+class PostSummary(BaseModel):
+    """Summary view RESPONSE data validator, `fields=` sends a subset of these
+    (plus content/updated_at) and always id and created_at"""
+
+    id: int
+    title: str
+    excerpt: str
+    published: bool
+    created_at: datetime
+    owner_id: int
+    owner_email: str
+    votes: int
+
+
+class PostBulkUpdateResponse(BaseModel):
+    """Bulk UPDATE RESPONSE data validator"""
+
+    updated: list[PostData]
+    skipped: list[int]  # not found, or owned by someone else
+
+
+class PostBulkDeleteResponse(BaseModel):
+    """Bulk DELETE RESPONSE data validator"""
+
+    deleted: list[int]
+    skipped: list[int]  # not found, or owned by someone else
+
+
+class PostBatchItem(BaseModel):
+    """Batch fetch RESPONSE data validator, one per requested id"""
+
+    id: int
+    found: bool
+    post: Optional[PostResponse] = None
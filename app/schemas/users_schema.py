@@ -11,7 +11,7 @@ from pydantic import BaseModel, EmailStr
 
 from sqlalchemy.sql.expression import text
 from sqlalchemy.sql.sqltypes import TIMESTAMP
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, ForeignKey, Integer, String
 
 from app.Database import db
 
@@ -35,6 +35,47 @@ class User(db.base):
     updated_at = Column(TIMESTAMP(timezone=True), server_default=text("NULL"))
 
 
+class RefreshToken(db.base):
+    """Schema for Refresh Tokens table"""
+
+    __tablename__ = "refresh_tokens"
+
+    # Columns
+    # sha256 of the token, the token itself is only known to the client
+    token_hash = Column(String(64), primary_key=True, nullable=False)
+    user_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
+
+
+class TokenRevocation(db.base):
+    """Schema for Token Revocations table, a log every worker replays"""
+
+    __tablename__ = "token_revocations"
+
+    # Columns
+    id = Column(Integer, primary_key=True, nullable=False)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    # Either a single access token (jti), or all the user's access tokens issued
+    # before `revoked_before`
+    jti = Column(String, nullable=True)
+    revoked_before = Column(TIMESTAMP(timezone=True), nullable=True)
+    # No token the entry applies to is valid past this, the entry can go then
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False, index=True)
+    created_at = Column(
+        TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
+    )
+
+
 # ---------------------------------------------------------------------------- #
 #                          Pydantic request validators                         #
 # ---------------------------------------------------------------------------- #
@@ -72,9 +113,25 @@ class AuthToken(BaseModel):
 
     access_token: str
     token_type: str
+    refresh_token: Optional[str]
+
+
+class RefreshTokenRequest(BaseModel):
+    """Refresh token exchange request validator"""
+
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    """Logout request validator"""
+
+    refresh_token: Optional[str]
 
 
 class TokenData(BaseModel):
     """Data to create the access token validator"""
 
     id: Optional[str]
+    jti: Optional[str]
+    iat: Optional[int]
+    exp: Optional[int]
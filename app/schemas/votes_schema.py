@@ -27,8 +27,13 @@ class Vote(db.base):
     post_id = Column(
         Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True
     )
+    # (post_id, user_id) primary key also serves lookups by post_id, user_id
+    # needs its own index (user deletes cascade to votes)
     user_id = Column(
-        Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        index=True,
     )
     liked_at = Column(
         TIMESTAMP(timezone=True), nullable=False, server_default=text("now()")
@@ -0,0 +1,49 @@
+# pylint: disable=E0401, E0611
+
+"""
+Benchmark: login capacity per CPU core at each bcrypt cost
+
+A login costs one bcrypt verification, so a core serves about 1000 / (ms per
+verification) logins per second. Each cost is timed single threaded (what one
+process of the password hashing pool does) to pick BCRYPT_ROUNDS against a
+login capacity target, e.g. with PASSWORD_HASH_WORKERS processes per worker:
+
+    logins/sec ≈ logins/sec/core × PASSWORD_HASH_WORKERS × workers
+
+Usage:
+    python -m benchmarks.bcrypt_rounds --rounds 10 11 12 13 --verifications 20
+"""
+
+# Imports
+import time
+import argparse
+import statistics
+
+from passlib.hash import bcrypt
+
+
+def main(args):
+    """Time verifications at every cost and print a table"""
+    print(f"{'rounds':>6}{'ms/login':>12}{'p99 ms':>10}{'logins/s/core':>16}")
+    for rounds in args.rounds:
+        hashed = bcrypt.using(rounds=rounds).hash("benchmark password")
+
+        timings = []
+        for _ in range(args.verifications):
+            start = time.perf_counter()
+            bcrypt.verify("benchmark password", hashed)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        median = statistics.median(timings)
+        print(
+            f"{rounds:>6}{median:>12.1f}"
+            f"{timings[int(len(timings) * 0.99) - 1]:>10.1f}{1000 / median:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12, 13, 14])
+    parser.add_argument("--verifications", type=int, default=10)
+    main(parser.parse_args())
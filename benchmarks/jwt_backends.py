@@ -0,0 +1,78 @@
+# pylint: disable=E0401, E0611
+
+"""
+Benchmark: JWT backends on create_access_token / verify_access_token
+
+Each available backend (app.Utils.jwt_backends) is swapped into app.Utils.oauth2
+in turn and both functions are timed call by call, with the verified tokens
+cache turned off so every verification actually decodes the token. Backends
+whose library isn't installed are skipped.
+
+Usage:
+    python -m benchmarks.jwt_backends --iterations 20000
+"""
+
+# Imports
+import time
+import argparse
+import statistics
+
+from fastapi import HTTPException, status
+
+from app.Utils import jwt_backends, oauth2
+from app.Utils.cache import TTLCache
+
+
+def measure(function, iterations: int) -> dict:
+    """Call `function` `iterations` times, return ops/sec, p50 and p99 in µs"""
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        function()
+        latencies.append(time.perf_counter_ns() - start)
+
+    latencies.sort()
+    return {
+        "ops": iterations / (sum(latencies) / 1e9),
+        "p50": statistics.median(latencies) / 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] / 1000,
+    }
+
+
+def main(args):
+    """Time every backend and print a table"""
+    unauthorized = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    oauth2.tokens_cache = TTLCache(ttl=0, max_bytes=0)
+    oauth2.revocation_list.loaded = True  # nothing revoked, no log to load
+
+    print(f"{'backend':<10}{'operation':<22}{'ops/s':>10}{'p50 µs':>10}{'p99 µs':>10}")
+    for name in jwt_backends.BACKENDS:
+        try:
+            oauth2.jwt_backend = jwt_backends.get_backend(
+                name, oauth2.settings.JWT_SECRET_KEY, oauth2.settings.JWT_ALOGORITHM
+            )
+        except (ImportError, ValueError) as error:
+            print(f"{name:<10}skipped: {error}")
+            continue
+
+        token = oauth2.create_access_token({"user_id": 1})
+        operations = {
+            "create_access_token": lambda: oauth2.create_access_token({"user_id": 1}),
+            # pylint: disable=W0640
+            "verify_access_token": lambda: oauth2.verify_access_token(
+                token, unauthorized
+            ),
+        }
+        for operation, function in operations.items():
+            measure(function, min(1000, args.iterations))  # warmup
+            stats = measure(function, args.iterations)
+            print(
+                f"{name:<10}{operation:<22}{stats['ops']:>10.0f}"
+                f"{stats['p50']:>10.1f}{stats['p99']:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--iterations", type=int, default=10000)
+    main(parser.parse_args())
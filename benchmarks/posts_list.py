@@ -0,0 +1,191 @@
+# pylint: disable=E0401, E0611, W0703
+
+"""
+Benchmark: sync (threadpool) vs async (asyncpg) database path on the posts list
+
+The same posts list query (posts_model.all_posts_query) is served by two routes:
+
+    /sync/posts     plain `def` route, psycopg2 session, runs on the threadpool
+    /async/posts    `async def` route, asyncpg session, runs on the event loop
+
+Requests are driven in-process through the ASGI interface so that no HTTP
+client or server overhead is measured. Both engines get a pool large enough for
+the highest concurrency (keep it below Postgres `max_connections`) so only the
+threadpool vs event loop difference shows.
+
+Usage:
+    python -m benchmarks.posts_list --requests 2000 --concurrency 1 20 50
+    python -m benchmarks.posts_list --db-latency-ms 20   # simulate a slow DB
+"""
+
+# Imports
+import time
+import asyncio
+import argparse
+import statistics
+
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.Database import db
+from app.Models import posts_model
+from app.schemas import posts_schema
+
+
+# ---------------------------------------------------------------------------- #
+#                                 Benchmark App                                #
+# ---------------------------------------------------------------------------- #
+
+
+def build_app(pool_size: int, db_latency_ms: int) -> FastAPI:
+    """
+    Build an app serving the posts list through both database paths
+
+    Args:
+        pool_size (int): Connection pool size for both engines
+        db_latency_ms (int): Extra server side sleep per request (0 = none)
+
+    Returns:
+        FastAPI: Benchmark application
+    """
+    sync_engine = create_engine(
+        db.SQLALCHEMY_DATABASE_URL, pool_size=pool_size, max_overflow=0
+    )
+    sync_session_local = sessionmaker(bind=sync_engine, autoflush=False)
+
+    async_engine = create_async_engine(
+        db.SQLALCHEMY_ASYNC_DATABASE_URL, pool_size=pool_size, max_overflow=0
+    )
+    async_session_local = sessionmaker(
+        bind=async_engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    sleep = text("SELECT pg_sleep(:seconds)").bindparams(seconds=db_latency_ms / 1000)
+
+    def sync_session():
+        database = sync_session_local()
+        try:
+            yield database
+        finally:
+            database.close()
+
+    async def async_session():
+        database = async_session_local()
+        try:
+            yield database
+        finally:
+            await database.close()
+
+    bench_app = FastAPI()
+
+    @bench_app.get("/sync/posts", response_model=list[posts_schema.PostResponse])
+    def sync_posts(database: Session = Depends(sync_session)):
+        if db_latency_ms:
+            database.execute(sleep)
+        return database.execute(posts_model.all_posts_query(10, 0, "")).all()
+
+    @bench_app.get("/async/posts", response_model=list[posts_schema.PostResponse])
+    async def async_posts(database: AsyncSession = Depends(async_session)):
+        if db_latency_ms:
+            await database.execute(sleep)
+        posts, _ = await posts_model.get_all_posts(database, 10, 0, "", cache=False)
+        return posts
+
+    @bench_app.on_event("shutdown")
+    async def dispose():
+        sync_engine.dispose()
+        await async_engine.dispose()
+
+    return bench_app
+
+
+# ---------------------------------------------------------------------------- #
+#                                  ASGI Driver                                 #
+# ---------------------------------------------------------------------------- #
+
+
+async def call(bench_app: FastAPI, path: str) -> float:
+    """Send one GET request through the ASGI interface, return latency in seconds"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    status_code = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    start = time.perf_counter()
+    await bench_app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+
+    if status_code != 200:
+        raise RuntimeError(f"{path} responded with {status_code}")
+    return elapsed
+
+
+async def run(bench_app: FastAPI, path: str, requests: int, concurrency: int):
+    """Fire `requests` requests at `path`, at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            return await call(bench_app, path)
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(limited() for _ in range(requests)))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(latencies)
+    return {
+        "rps": requests / wall,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args):
+    """Run every path at every concurrency level and print a table"""
+    bench_app = build_app(max(args.concurrency), args.db_latency_ms)
+    await bench_app.router.startup()
+
+    print(f"{'path':<14}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    try:
+        for concurrency in args.concurrency:
+            for path in ("/sync/posts", "/async/posts"):
+                # warmup
+                await run(bench_app, path, min(50, args.requests), concurrency)
+                stats = await run(bench_app, path, args.requests, concurrency)
+                print(
+                    f"{path:<14}{concurrency:>6}{stats['rps']:>10.1f}"
+                    f"{stats['p50']:>10.2f}{stats['p99']:>10.2f}"
+                )
+                # Release the idle connections of this path before the next one
+                await bench_app.router.shutdown()
+    finally:
+        await bench_app.router.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 20, 50])
+    parser.add_argument("--db-latency-ms", type=int, default=0)
+    asyncio.run(main(parser.parse_args()))
@@ -9,12 +9,19 @@ from fastapi.testclient import TestClient
 
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
 from app.main import app
 from app.Database import db
 from app.settings import settings
 from app.schemas import users_schema, posts_schema
 from app.Utils import oauth2
+from app.Models import posts_model, users_model
+from app.Database import query_counter
+from app.Routes import internal_routes
+from app.Models.token_revocations import revocation_list
+from app.Utils.rate_limit import admission
 
 # App Settings
 settings = settings.Settings()
@@ -30,11 +37,21 @@ HOST = settings.POSTGRES_HOST
 DATABASE = settings.DATABASE
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{USER}:{PASS}@{HOST}/{DATABASE}_test"
+SQLALCHEMY_ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{USER}:{PASS}@{HOST}/{DATABASE}_test"
+)
 
 # Set up database
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 testing_session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# TestClient runs every request on a fresh event loop, asyncpg connections
+# can't be shared between loops so don't pool them.
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL, poolclass=NullPool)
+testing_async_session_local = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 
 # ---------------------------------------------------------------------------- #
 #                                    Testing                                   #
@@ -48,6 +65,12 @@ def session():
     """Create DB session"""
     db.base.metadata.drop_all(bind=engine)
     db.base.metadata.create_all(bind=engine)
+    posts_model.posts_cache.clear()
+    users_model.users_cache.clear()
+    oauth2.tokens_cache.clear()
+    revocation_list.clear()
+    revocation_list.loaded = True  # the test log starts empty
+    admission.clear()
     database = testing_session_local()
     try:
         print('HERE in Session')
@@ -65,7 +88,18 @@ def client(session):
         finally:
             session.close()
 
+    async def connect_to_test_async_postgres_db():
+        """Create test async postgres session"""
+        database = testing_async_session_local()
+        try:
+            yield database
+        finally:
+            await database.close()
+
     app.dependency_overrides[db.connect_to_postgres_db] = connect_to_test_postgres_db
+    app.dependency_overrides[
+        db.connect_to_async_postgres_db
+    ] = connect_to_test_async_postgres_db
     print('HERE in Client')
     yield TestClient(app)
 
@@ -139,4 +173,18 @@ def test_posts(test_user, test_user2, session):
     
     session.add_all(list(map(create_post_model, posts_data)))
     session.commit()
-    return session.query(posts_schema.Post).all()
\ No newline at end of file
+    return session.query(posts_schema.Post).all()
+
+
+@pytest.fixture
+def internal_client(client, monkeypatch):
+    """Client allowed on the internal routes"""
+    monkeypatch.setattr(internal_routes.settings, "INTERNAL_API_TOKEN", "internal")
+    client.headers = {**client.headers, "X-Internal-Token": "internal"}
+    return client
+
+
+@pytest.fixture
+def count_statements(monkeypatch):
+    """Send the number of SQL statements of each request in X-SQL-Statements"""
+    monkeypatch.setattr(query_counter.settings, "SQL_STATEMENT_COUNT_HEADER", True)
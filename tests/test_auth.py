@@ -0,0 +1,212 @@
+"""
+Test logout and access token revocation
+"""
+
+# Imports
+import time
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+from fastapi import status
+
+from app.Models.token_revocations import RevocationList
+from app.Utils import oauth2
+from app.schemas import users_schema
+from app.settings.settings import Settings
+from tests import conftest
+
+settings = Settings()
+
+# ---------------------------------------------------------------------------- #
+#                                     Tests                                    #
+# ---------------------------------------------------------------------------- #
+
+
+def login(client, user) -> dict:
+    """Log the user in, return the tokens"""
+    response = client.post(
+        "/api/login", data={"username": user["email"], "password": user["password"]}
+    )
+    return response.json()
+
+
+def bearer(tokens: dict) -> dict:
+    """Authorization header of the access token"""
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+def test_logout_revokes_token(client, test_user):
+    """Test logout revokes the access and refresh tokens sent, not the others"""
+    tokens, other_tokens = login(client, test_user), login(client, test_user)
+
+    response = client.post(
+        "/api/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers=bearer(tokens),
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = client.get("/api/posts/", headers=bearer(tokens))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post(
+        "/api/token/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.get("/api/posts/", headers=bearer(other_tokens))
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_logout_everywhere(client, test_user, test_user2):
+    """Test revoking every token issued to the user so far"""
+    refresh_token = login(client, test_user)["refresh_token"]
+    issued_at = int(time.time()) - 60
+    old_tokens = {
+        "access_token": jwt.encode(
+            {"user_id": test_user["id"], "iat": issued_at, "exp": issued_at + 600},
+            settings.JWT_SECRET_KEY,
+            algorithm=settings.JWT_ALOGORITHM,
+        )
+    }
+    # Issued in the same second as the cutoff
+    tokens = login(client, test_user)
+
+    response = client.post("/api/logout/all", headers=bearer(tokens))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = client.get("/api/posts/", headers=bearer(tokens))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.get("/api/posts/", headers=bearer(old_tokens))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.post("/api/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.get("/api/posts/", headers=bearer(login(client, test_user2)))
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_revocations_sync_between_workers(client, test_user):
+    """Test another worker picks revocations up from the log"""
+    other_worker = RevocationList(conftest.testing_async_session_local, 5, 100)
+    asyncio.run(other_worker.sync())
+
+    tokens = login(client, test_user)
+    client.post("/api/logout", headers=bearer(tokens))
+    token = oauth2.decode_access_token(tokens["access_token"], Exception())
+    assert not other_worker.is_revoked(token)
+
+    asyncio.run(other_worker.sync())
+    assert other_worker.is_revoked(token)
+    assert other_worker.stats()["syncs"] == 2
+
+
+def test_tokens_refused_until_log_is_loaded(client, test_user):
+    """Test a starting worker loads the log before serving, and refuses every
+    token while it can't"""
+    token = oauth2.decode_access_token(
+        login(client, test_user)["access_token"], Exception()
+    )
+
+    class UnreachableDatabase:
+        """Session factory of a database which is down"""
+
+        async def __aenter__(self):
+            raise ConnectionRefusedError("database is down")
+
+        async def __aexit__(self, *exc):
+            pass
+
+    async def start_and_stop(worker):
+        await worker.start()
+        is_revoked = worker.is_revoked(token)
+        await worker.stop()
+        return is_revoked
+
+    worker = RevocationList(UnreachableDatabase, 5, 100)
+    assert asyncio.run(start_and_stop(worker))
+    assert worker.stats()["sync_errors"] == 1
+
+    worker = RevocationList(conftest.testing_async_session_local, 5, 100)
+    assert not asyncio.run(start_and_stop(worker))
+    assert worker.stats()["loaded"]
+
+
+def test_logout_token_without_jti(client, test_user):
+    """Test logging out with a token issued before tokens had a jti"""
+    issued_at = int(time.time()) - 60
+    tokens = {
+        "access_token": jwt.encode(
+            {"user_id": test_user["id"], "iat": issued_at, "exp": issued_at + 600},
+            settings.JWT_SECRET_KEY,
+            algorithm=settings.JWT_ALOGORITHM,
+        )
+    }
+
+    response = client.post("/api/logout", headers=bearer(tokens))
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = client.get("/api/posts/", headers=bearer(tokens))
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    response = client.get("/api/posts/", headers=bearer(login(client, test_user)))
+    assert response.status_code == status.HTTP_200_OK
+
+    other_worker = RevocationList(conftest.testing_async_session_local, 5, 100)
+    asyncio.run(other_worker.sync())
+    assert other_worker.stats()["revoked_users"] == 1
+    assert other_worker.stats()["sync_errors"] == 0
+
+
+def test_sync_skips_malformed_revocations(session, test_user):
+    """Test a malformed log entry is skipped without stalling the sync"""
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    malformed = users_schema.TokenRevocation(
+        user_id=test_user["id"], expires_at=expires_at
+    )
+    revoked = users_schema.TokenRevocation(
+        user_id=test_user["id"], jti="revoked", expires_at=expires_at
+    )
+    session.add_all([malformed, revoked])
+    session.commit()
+
+    other_worker = RevocationList(conftest.testing_async_session_local, 5, 100)
+    asyncio.run(other_worker.sync())
+
+    assert other_worker.last_id == revoked.id
+    assert other_worker.is_revoked(users_schema.TokenData(id="1", jti="revoked"))
+    assert other_worker.stats()["skipped_entries"] == 1
+    assert other_worker.stats()["sync_errors"] == 0
+
+
+def test_sync_picks_up_entries_committed_out_of_order(session, test_user):
+    """Test an entry committed after one with a higher id is still applied"""
+    expires_at = datetime.now(timezone.utc) + timedelta(minutes=5)
+    other_worker = RevocationList(conftest.testing_async_session_local, 5, 100)
+
+    session.add(
+        users_schema.TokenRevocation(
+            id=10, user_id=test_user["id"], jti="first", expires_at=expires_at
+        )
+    )
+    session.commit()
+    asyncio.run(other_worker.sync())
+    assert other_worker.last_id == 10
+
+    # Id taken before entry 10, committed after it
+    session.add(
+        users_schema.TokenRevocation(
+            id=5, user_id=test_user["id"], jti="late", expires_at=expires_at
+        )
+    )
+    session.commit()
+    asyncio.run(other_worker.sync())
+
+    assert other_worker.is_revoked(users_schema.TokenData(id="1", jti="late"))
+    assert other_worker.last_id == 10
+
+
+def test_revocation_metrics(internal_client):
+    """Test revocation list metrics endpoint"""
+    response = internal_client.get("/api/internal/revocations")
+    assert response.status_code == status.HTTP_200_OK
+    assert {"revoked_tokens", "revoked_users", "syncs"} <= set(response.json())
@@ -0,0 +1,125 @@
+"""
+Test the posts read cache
+"""
+
+# Imports
+import pytest
+from fastapi import status
+
+from app.Database.replicas import replica_router
+from app.Models import posts_model
+from app.Utils.cache import MISSING, TTLCache, approximate_size
+
+# ---------------------------------------------------------------------------- #
+#                                   Fixtures                                   #
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.fixture
+def cached_client(authorized_client, monkeypatch):
+    """Authorized client outside of its read-your-writes window (signing up is a
+    write, and reads right after a write bypass the cache)"""
+    monkeypatch.setattr(replica_router, "_writes", {})
+    authorized_client.cookies.clear()
+    return authorized_client
+
+
+# ---------------------------------------------------------------------------- #
+#                                     Tests                                    #
+# ---------------------------------------------------------------------------- #
+
+
+def test_cache_evicts_least_recently_used_over_byte_budget():
+    """Test LRU eviction once the byte budget is exceeded"""
+    value = {"title": "x" * 100}
+    cache = TTLCache(ttl=60, max_bytes=approximate_size(value) * 2)
+
+    cache.set("a", value)
+    cache.set("b", value)
+    cache.get("a")
+    cache.set("c", value)
+
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+    assert cache.stats()["evictions"] == 1
+    assert cache.size <= cache.max_bytes
+
+
+def test_cache_expires_entries(monkeypatch):
+    """Test entries are dropped after the TTL"""
+    cache = TTLCache(ttl=10, max_bytes=1024 * 1024)
+    cache.set("a", 1)
+
+    monkeypatch.setattr("app.Utils.cache.time.monotonic", lambda: float("inf"))
+
+    assert cache.get("a") is MISSING
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_invalidates_by_tag_and_skips_stale_sets():
+    """Test tag invalidation and that reads racing an invalidation aren't cached"""
+    cache = TTLCache(ttl=60, max_bytes=1024 * 1024)
+    cache.set("page_1", [1, 2], tags=[1, 2])
+    cache.set("page_2", [3], tags=[3])
+
+    version = cache.version
+    cache.invalidate_tag(2)
+    cache.set("page_1", [1, 2], tags=[1, 2], version=version)
+
+    assert cache.get("page_1") is MISSING
+    assert cache.get("page_2") == [3]
+
+
+def test_posts_list_is_cached(cached_client, test_posts):
+    """Test repeated list reads are served from the cache"""
+    cached_client.get("/api/posts/?limit=3")
+    hits = posts_model.posts_cache.hits
+
+    response = cached_client.get("/api/posts/?limit=3")
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()) == 3
+    assert posts_model.posts_cache.hits == hits + 1
+
+
+def test_vote_invalidates_cached_post(cached_client, test_posts):
+    """Test a vote drops the cached post and the pages holding it"""
+    post_id = test_posts[0].id
+    cached_client.get(f"/api/posts/{post_id}")
+    cached_client.get("/api/posts/")
+
+    response = cached_client.post(
+        "/api/vote/", json={"post_id": post_id, "dir": 1}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert posts_model.posts_cache.stats()["entries"] == 0
+
+    replica_router._writes.clear()  # pylint: disable=W0212
+    cached_client.cookies.clear()
+    response = cached_client.get(f"/api/posts/{post_id}")
+    assert response.json()["votes"] == 1
+
+
+def test_update_keeps_unrelated_entries(cached_client, test_posts):
+    """Test updating a post only drops the entries holding it"""
+    cached_client.get(f"/api/posts/{test_posts[0].id}")
+    cached_client.get(f"/api/posts/{test_posts[1].id}")
+
+    response = cached_client.put(
+        f"/api/posts/{test_posts[0].id}",
+        json={"title": "updated title", "content": "updated content"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    assert posts_model.posts_cache.get(("post", test_posts[0].id)) is MISSING
+    assert posts_model.posts_cache.get(("post", test_posts[1].id)) is not MISSING
+
+
+def test_cache_metrics(internal_client):
+    """Test cache metrics endpoint"""
+    response = internal_client.get("/api/internal/cache")
+    assert response.status_code == status.HTTP_200_OK
+    assert {"hits", "misses", "evictions", "bytes", "max_bytes"} <= set(
+        response.json()["posts"]
+    )
+    assert "hits" in response.json()["users"]
@@ -0,0 +1,64 @@
+"""
+Test internal operational endpoints
+"""
+
+# Imports
+import pytest
+from fastapi import status
+from sqlalchemy import create_engine, exc
+
+from app.Database.pool import InstrumentedQueuePool
+from app.Routes import internal_routes
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+# ---------------------------------------------------------------------------- #
+#                                     Tests                                    #
+# ---------------------------------------------------------------------------- #
+
+
+def test_pool_metrics(internal_client):
+    """Test pool metrics endpoint"""
+    response = internal_client.get("/api/internal/pool")
+    metrics = response.json()
+    assert response.status_code == status.HTTP_200_OK
+    assert {"in_use", "overflow", "checkouts", "checkout_timeouts"} <= set(
+        metrics["primary"]
+    )
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Internal-Token": "wrong"}])
+def test_internal_routes_need_token(client, monkeypatch, headers):
+    """Test internal routes refuse callers without the shared secret"""
+    monkeypatch.setattr(internal_routes.settings, "INTERNAL_API_TOKEN", "internal")
+    response = client.get("/api/internal/pool", headers=headers)
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_internal_routes_off_without_token(client):
+    """Test internal routes are off while no shared secret is configured"""
+    response = client.get("/api/internal/pool", headers={"X-Internal-Token": ""})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+def test_instrumented_pool_counts_checkouts_and_timeouts():
+    """Test checkout wait and timeout counters of the instrumented pool"""
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.1,
+    )
+    metrics = engine.pool.metrics
+
+    with engine.connect():
+        assert metrics.snapshot(engine.pool)["in_use"] == 1
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    snapshot = metrics.snapshot(engine.pool)
+    assert snapshot["checkouts"] == 1
+    assert snapshot["checkout_timeouts"] == 1
+    assert snapshot["in_use"] == 0
+    engine.dispose()
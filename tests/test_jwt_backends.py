@@ -0,0 +1,121 @@
+"""
+Conformance suite every JWT backend has to pass
+"""
+
+# Imports
+import time
+import string
+import importlib.util
+
+import pytest
+
+from app.Utils.jwt_backends import BACKENDS, InvalidTokenError, b64url_encode
+
+SECRET = "conformance_secret"
+ALGORITHM = "HS256"
+
+# Backends whose library isn't installed are skipped
+REQUIRES = {"jose": "jose", "pyjwt": "jwt"}
+NAMES = [
+    pytest.param(
+        name,
+        marks=pytest.mark.skipif(
+            name in REQUIRES and importlib.util.find_spec(REQUIRES[name]) is None,
+            reason=f"{REQUIRES.get(name)} not installed",
+        ),
+    )
+    for name in BACKENDS
+]
+
+# ---------------------------------------------------------------------------- #
+#                                   Fixtures                                   #
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.fixture(params=NAMES)
+def backend(request):
+    """Every available backend"""
+    return BACKENDS[request.param](SECRET, ALGORITHM)
+
+
+@pytest.fixture(params=NAMES)
+def other_backend(request):
+    """Every available backend, to check tokens are interchangeable"""
+    return BACKENDS[request.param](SECRET, ALGORITHM)
+
+
+def claims(**overrides) -> dict:
+    """Claims of a valid access token"""
+    now = int(time.time())
+    return {"user_id": 7, "iat": now, "exp": now + 60, "jti": "abc", **overrides}
+
+
+# ---------------------------------------------------------------------------- #
+#                                     Tests                                    #
+# ---------------------------------------------------------------------------- #
+
+
+def test_round_trip(backend):
+    """Test claims come back as they were signed"""
+    token_claims = claims()
+    assert backend.decode(backend.encode(token_claims)) == token_claims
+
+
+def test_tokens_are_interchangeable(backend, other_backend):
+    """Test a token signed by one backend is accepted by the others"""
+    token_claims = claims()
+    assert other_backend.decode(backend.encode(token_claims)) == token_claims
+
+
+@pytest.mark.parametrize(
+    "token_claims",
+    [claims(exp=int(time.time()) - 10), claims(nbf=int(time.time()) + 60)],
+    ids=["expired", "not_yet_valid"],
+)
+def test_rejects_invalid_claims(backend, token_claims):
+    """Test expired and not yet valid tokens are refused"""
+    with pytest.raises(InvalidTokenError):
+        backend.decode(backend.encode(token_claims))
+
+
+def test_rejects_forged_tokens(backend):
+    """Test tokens with a wrong key, tampered payload or no signature are refused"""
+    token = backend.encode(claims())
+    header, payload, _ = token.split(".")
+    forged_payload = b64url_encode(b'{"user_id":1}').decode()
+    unsigned_header = b64url_encode(b'{"alg":"none","typ":"JWT"}').decode()
+
+    for forged in (
+        BACKENDS[backend.name]("wrong_secret", ALGORITHM).encode(claims()),
+        f"{header}.{forged_payload}.{token.rsplit('.', 1)[1]}",
+        f"{unsigned_header}.{payload}.",
+        f"{header}.{payload}.",
+    ):
+        with pytest.raises(InvalidTokenError):
+            backend.decode(forged)
+
+
+def test_rejects_tampered_encodings(backend):
+    """Test a token is only accepted in its own encoding: a signature with its
+    unused bits set, padding or characters outside base64url are refused"""
+    token = backend.encode(claims())
+    header, payload, signature = token.split(".")
+    alphabet = string.ascii_uppercase + string.ascii_lowercase + string.digits + "-_"
+    # An HS256 signature is 32 bytes, the last of its 43 characters has 2 unused bits
+    unused_bit_set = signature[:-1] + alphabet[alphabet.index(signature[-1]) ^ 1]
+
+    for tampered in (
+        f"{header}.{payload}.{unused_bit_set}",
+        f"{header}.{payload}.{signature}=",
+        f"{header}.{payload}!.{signature}",
+        f"{header}.{payload}.{signature[:-1]}+",
+    ):
+        with pytest.raises(InvalidTokenError):
+            backend.decode(tampered)
+
+
+@pytest.mark.parametrize("token", ["", "abc", "a.b.c", "a.b", "...."])
+def test_rejects_malformed_tokens(backend, token):
+    """Test garbage is refused with InvalidTokenError"""
+    with pytest.raises(InvalidTokenError):
+        backend.decode(token)
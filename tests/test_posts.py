@@ -3,10 +3,13 @@ Test posts operations
 """
 
 # Imports
+import json
+from datetime import datetime
 from pprint import pprint
 from fastapi import status
 import pytest
 
+from app.Models import posts_model
 from app.schemas import posts_schema
 
 # ---------------------------------------------------------------------------- #
@@ -27,6 +30,178 @@ def test_get_all_posts(authorized_client, test_posts):
     assert response.status_code == status.HTTP_200_OK
 
 
+def test_get_all_posts_by_cursor(authorized_client, test_posts):
+    """Test paging through all posts with the keyset cursor"""
+    response = authorized_client.get("/api/posts/?limit=3")
+    first_page = [post["Post"]["id"] for post in response.json()]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = authorized_client.get(f"/api/posts/?limit=3&cursor={cursor}")
+    second_page = [post["Post"]["id"] for post in response.json()]
+
+    # Posts are created in one transaction (same created_at), ties go by id
+    assert first_page + second_page == sorted(
+        [post.id for post in test_posts], reverse=True
+    )
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_all_posts_invalid_cursor(authorized_client):
+    """Test paging with a malformed cursor"""
+    response = authorized_client.get("/api/posts/?cursor=not-a-cursor")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize("query", ["limit=0", "limit=101", "skip=-1"])
+def test_get_all_posts_limit_bounds(authorized_client, query):
+    """Test page size and offset are bounded"""
+    response = authorized_client.get(f"/api/posts/?{query}")
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+def test_export_posts(authorized_client, test_posts, monkeypatch):
+    """Test streaming every post as NDJSON, across several fetch batches"""
+    monkeypatch.setattr(posts_model.settings, "POSTS_EXPORT_BATCH_SIZE", 3)
+    response = authorized_client.get("/api/posts/export")
+    posts = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [post["id"] for post in posts] == sorted(post.id for post in test_posts)
+    assert posts[0]["content"] == test_posts[0].content
+
+
+def test_export_posts_fulltext_without_search(authorized_client, test_posts):
+    """Test full text mode with no search string exports every post"""
+    response = authorized_client.get("/api/posts/export?mode=fulltext")
+    posts = [json.loads(line) for line in response.text.splitlines()]
+    assert [post["id"] for post in posts] == sorted(post.id for post in test_posts)
+
+
+def test_export_posts_fields_and_search(authorized_client, test_posts):
+    """Test exporting some fields of the matching posts"""
+    response = authorized_client.get("/api/posts/export?search=2nd&fields=title")
+    posts = [json.loads(line) for line in response.text.splitlines()]
+    assert [post["id"] for post in posts] == [test_posts[1].id]
+    assert posts[0]["title"] == "2nd title"
+    # Same instant, whatever time zone the database session renders it in
+    assert datetime.fromisoformat(posts[0]["created_at"]) == test_posts[1].created_at
+    assert set(posts[0]) == {"id", "created_at", "title"}
+
+
+def test_get_all_posts_summary(authorized_client, test_posts, test_user2):
+    """Test the summary view sends an excerpt instead of the content"""
+    response = authorized_client.get("/api/posts/?view=summary&limit=3")
+    summaries = [posts_schema.PostSummary(**post) for post in response.json()]
+
+    assert response.status_code == status.HTTP_200_OK
+    assert "content" not in response.json()[0]
+    assert [post.id for post in summaries] == [post.id for post in test_posts[:0:-1]]
+    assert summaries[0].excerpt == test_posts[3].content
+    assert summaries[0].owner_email == test_user2["email"]
+    assert "X-Next-Cursor" in response.headers
+
+
+def test_get_all_posts_fields(authorized_client, test_posts):
+    """Test sending only the requested fields (plus the paging key)"""
+    response = authorized_client.get("/api/posts/?fields=title,votes&limit=2")
+    tag = response.headers["ETag"]
+
+    assert response.status_code == status.HTTP_200_OK
+    assert set(response.json()[0]) == {"id", "created_at", "title", "votes"}
+
+    response = authorized_client.get(
+        "/api/posts/?fields=title,votes&limit=2", headers={"If-None-Match": tag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+def test_get_all_posts_invalid_fields(authorized_client):
+    """Test requesting a field posts don't have"""
+    response = authorized_client.get("/api/posts/?fields=title,password")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+@pytest.mark.parametrize("path", ["/api/posts/", "/api/posts/?limit=1"])
+def test_get_all_posts_statement_count(
+    authorized_client, test_posts, count_statements, path
+):
+    """Test a page of posts (and their owners) takes one query whatever its size"""
+    posts_model.posts_cache.clear()
+    response = authorized_client.get(path)
+
+    # Current user lookup + posts joined with owners
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["X-SQL-Statements"] == "2"
+
+
+def test_get_post_statement_count(authorized_client, test_posts, count_statements):
+    """Test a single post and its owner take one query"""
+    posts_model.posts_cache.clear()
+    response = authorized_client.get(f"/api/posts/{test_posts[0].id}")
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["X-SQL-Statements"] == "2"
+
+
+@pytest.mark.parametrize(
+    "search, mode, expected",
+    [
+        ("title", "title", [3, 2, 1, 0]),
+        ("CONTENT", "substring", [3, 2, 1, 0]),
+        ("2nd cont", "substring", [1]),
+        ("first", "fulltext", [0]),
+        ("titles -2nd", "fulltext", [3, 2, 0]),
+        ("nothing", "fulltext", []),
+        ("", "fulltext", [3, 2, 1, 0]),
+        ("", "substring", [3, 2, 1, 0]),
+    ],
+)
+def test_search_posts(authorized_client, test_posts, search, mode, expected):
+    """Test searching posts in every search mode"""
+    response = authorized_client.get(f"/api/posts/?search={search}&mode={mode}")
+    post_ids = [post["Post"]["id"] for post in response.json()]
+    assert response.status_code == status.HTTP_200_OK
+    assert post_ids == [test_posts[index].id for index in expected]
+
+
+def test_fulltext_search_ranked_by_cursor(authorized_client, test_posts):
+    """Test ranked full text results page with the cursor"""
+    authorized_client.post(
+        "/api/posts/", json={"title": "beach", "content": "beach beach trip"}
+    )
+    authorized_client.post("/api/posts/", json={"title": "beach", "content": "trip"})
+
+    response = authorized_client.get("/api/posts/?search=beach&mode=fulltext&limit=1")
+    best_match = response.json()[0]["Post"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = authorized_client.get(
+        f"/api/posts/?search=beach&mode=fulltext&limit=1&cursor={cursor}"
+    )
+    assert best_match["content"] == "beach beach trip"
+    assert response.json()[0]["Post"]["content"] == "trip"
+
+
+def test_fulltext_search_fields_without_rank(authorized_client, test_posts):
+    """Test the rank orders ranked pages of fields but isn't sent"""
+    authorized_client.post(
+        "/api/posts/", json={"title": "beach", "content": "beach beach trip"}
+    )
+    authorized_client.post("/api/posts/", json={"title": "beach", "content": "trip"})
+
+    response = authorized_client.get(
+        "/api/posts/?search=beach&mode=fulltext&fields=content&limit=1"
+    )
+    cursor = response.headers["X-Next-Cursor"]
+    assert set(response.json()[0]) == {"id", "created_at", "content"}
+
+    response = authorized_client.get(
+        f"/api/posts/?search=beach&mode=fulltext&fields=content&limit=1&cursor={cursor}"
+    )
+    assert response.json()[0]["content"] == "trip"
+
+
 def test_unauthorized_get_all_posts(client):
     """Test all posts with unauthorized user"""
     response = client.get("/api/posts/")
@@ -52,6 +227,63 @@ def test_get_post(authorized_client, test_posts):
     assert response.status_code == status.HTTP_200_OK
 
 
+def test_get_posts_batch(authorized_client, test_posts, count_statements):
+    """Test fetching many posts in one call, in request order"""
+    ids = [test_posts[2].id, 123321, test_posts[0].id]
+    response = authorized_client.get(f"/api/posts/batch?ids={','.join(map(str, ids))}")
+    items = response.json()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [item["id"] for item in items] == ids
+    assert [item["found"] for item in items] == [True, False, True]
+    assert items[1]["post"] is None
+    assert items[2]["post"]["Post"]["title"] == test_posts[0].title
+    # Current user lookup + one query for every post
+    assert response.headers["X-SQL-Statements"] == "2"
+
+
+@pytest.mark.parametrize(
+    "ids", ["1,a", "", ",".join(["1"] * 101), "1,99999999999", "-2147483649"]
+)
+def test_get_posts_batch_invalid_ids(authorized_client, ids):
+    """Test batch fetch with malformed or too many ids"""
+    response = authorized_client.get(f"/api/posts/batch?ids={ids}")
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_get_post_not_modified(authorized_client, test_posts):
+    """Test conditional GET of a post, and that a vote changes its ETag"""
+    path = f"/api/posts/{test_posts[3].id}"
+    tag = authorized_client.get(path).headers["ETag"]
+
+    response = authorized_client.get(path, headers={"If-None-Match": tag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == tag
+    assert response.content == b""
+
+    authorized_client.post("/api/vote/", json={"post_id": test_posts[3].id, "dir": 1})
+    response = authorized_client.get(path, headers={"If-None-Match": tag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != tag
+
+
+def test_get_all_posts_not_modified(authorized_client, test_posts):
+    """Test conditional GET of a page of posts"""
+    response = authorized_client.get("/api/posts/?limit=2")
+    tag = response.headers["ETag"]
+
+    response = authorized_client.get(
+        "/api/posts/?limit=2", headers={"If-None-Match": f'"other", {tag}'}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert "X-Next-Cursor" in response.headers
+
+    response = authorized_client.get(
+        "/api/posts/?limit=3", headers={"If-None-Match": tag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
 # -------------------------------- Create Post ------------------------------- #
 
 
@@ -117,6 +349,13 @@ def test_delete_post_success(authorized_client, test_posts):
     assert response.status_code == status.HTTP_204_NO_CONTENT
 
 
+def test_delete_post_statement_count(authorized_client, test_posts, count_statements):
+    """Test deleting a post takes a single statement"""
+    response = authorized_client.delete(f"/api/posts/{test_posts[0].id}")
+    # Current user lookup + the delete
+    assert response.headers["X-SQL-Statements"] == "2"
+
+
 def test_delete_non_existing_post(authorized_client):
     """Test deletion of the non existing post"""
     response = authorized_client.delete(f"/api/posts/12321")
@@ -144,6 +383,15 @@ def test_update_post(authorized_client, test_posts):
     assert updated_post.content == data["content"]
 
 
+def test_update_post_statement_count(authorized_client, test_posts, count_statements):
+    """Test updating a post takes a single statement"""
+    data = {"title": "updated title", "content": "updatd content"}
+    response = authorized_client.put(f"/api/posts/{test_posts[0].id}", json=data)
+    # Current user lookup + the update
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["X-SQL-Statements"] == "2"
+
+
 def test_update_other_user_post(authorized_client, test_posts):
     """Test updating other users post"""
     data = {
@@ -175,3 +423,75 @@ def test_update_non_existing_post(authorized_client, test_posts):
     }
     response = authorized_client.put(f"/api/posts/123321", json=data)
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+# --------------------------------- Bulk Posts -------------------------------- #
+def test_bulk_create_posts(authorized_client, test_user, count_statements):
+    """Test creating many posts with one statement"""
+    new_posts = [
+        {"title": f"bulk title {index}", "content": "bulk content"}
+        for index in range(5)
+    ]
+    response = authorized_client.post("/api/posts/bulk", json=new_posts)
+    created_posts = [posts_schema.PostData(**post) for post in response.json()]
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert [post.title for post in created_posts] == [
+        post["title"] for post in new_posts
+    ]
+    assert {post.owner.id for post in created_posts} == {test_user["id"]}
+    # Current user lookup + the insert
+    assert response.headers["X-SQL-Statements"] == "2"
+
+
+def test_bulk_create_posts_too_many(authorized_client, monkeypatch):
+    """Test bulk creation is capped"""
+    monkeypatch.setattr("app.Routes.post_routes.settings.POSTS_BULK_MAX_ITEMS", 2)
+    new_posts = [{"title": "title", "content": "content"}] * 3
+    response = authorized_client.post("/api/posts/bulk", json=new_posts)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_bulk_update_posts(authorized_client, test_posts):
+    """Test updating many posts, other users' posts are skipped"""
+    data = [
+        {"id": test_posts[0].id, "title": "new first", "content": "new content"},
+        {"id": test_posts[3].id, "title": "not mine", "content": "new content"},
+        {"id": 123321, "title": "missing", "content": "new content"},
+        {"id": test_posts[2].id, "title": "new third", "content": "new content"},
+    ]
+    response = authorized_client.put("/api/posts/bulk", json=data)
+    result = response.json()
+
+    assert response.status_code == status.HTTP_200_OK
+    assert [post["title"] for post in result["updated"]] == ["new first", "new third"]
+    assert result["skipped"] == [test_posts[3].id, 123321]
+
+    response = authorized_client.get(f"/api/posts/{test_posts[3].id}")
+    assert response.json()["Post"]["title"] == test_posts[3].title
+
+
+def test_bulk_update_duplicate_posts(authorized_client, test_posts):
+    """Test updating the same post twice in one call"""
+    data = [{"id": test_posts[0].id, "title": "title", "content": "content"}] * 2
+    response = authorized_client.put("/api/posts/bulk", json=data)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+def test_bulk_delete_posts(authorized_client, test_posts):
+    """Test deleting many posts, other users' posts are kept"""
+    ids = [test_posts[0].id, test_posts[3].id, test_posts[1].id]
+    response = authorized_client.delete(
+        f"/api/posts/bulk?ids={','.join(map(str, ids))}"
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {
+        "deleted": [test_posts[0].id, test_posts[1].id],
+        "skipped": [test_posts[3].id],
+    }
+    response = authorized_client.get("/api/posts/")
+    assert [post["Post"]["id"] for post in response.json()] == [
+        test_posts[3].id,
+        test_posts[2].id,
+    ]
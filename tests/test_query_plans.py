@@ -0,0 +1,154 @@
+"""
+Query plan regression tests
+
+Every model-layer query is EXPLAINed against a large seeded dataset and must not
+fall back to a sequential scan on posts, users, votes or refresh_tokens. A failure here means a
+query changed shape or lost its index.
+
+(Substring search relies on pg_trgm indexes which only the alembic migration
+creates, so it isn't covered here.)
+"""
+
+# Imports
+import json
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.Database import db
+from app.Models import posts_model, users_model, votes_model
+from app.schemas.posts_schema import SearchMode
+from tests.conftest import engine
+
+USERS = 5_000
+POSTS = 50_000
+VOTES_PER_USER = 10
+
+# ---------------------------------------------------------------------------- #
+#                                   Fixtures                                   #
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.fixture(scope="module")
+def seeded_database():
+    """Seed a large dataset once for the whole module"""
+    db.base.metadata.drop_all(bind=engine)
+    db.base.metadata.create_all(bind=engine)
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO users (email, password) "
+                "SELECT 'user' || i || '@gmail.com', 'x' FROM generate_series(1, :n) i"
+            ),
+            {"n": USERS},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO posts (title, content, owner_id, created_at) "
+                "SELECT 'title ' || i, 'content number ' || i, 1 + i % :users, "
+                "now() - i * interval '1 minute' FROM generate_series(1, :n) i"
+            ),
+            {"n": POSTS, "users": USERS},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO votes (post_id, user_id) "
+                "SELECT 1 + (u * :per_user + v) % :posts, u "
+                "FROM generate_series(1, :users) u, generate_series(1, :per_user) v"
+            ),
+            {"users": USERS, "posts": POSTS, "per_user": VOTES_PER_USER},
+        )
+        conn.execute(
+            text(
+                "INSERT INTO refresh_tokens (token_hash, user_id, expires_at) "
+                "SELECT md5(u::text) || md5(u::text), u, now() + interval '1 day' "
+                "FROM generate_series(1, :users) u"
+            ),
+            {"users": USERS},
+        )
+
+    # Like autovacuum would: collect stats and flush the GIN pending list
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE"))
+
+    yield engine
+    db.base.metadata.drop_all(bind=engine)
+
+
+# ---------------------------------------------------------------------------- #
+#                                    Helpers                                   #
+# ---------------------------------------------------------------------------- #
+
+
+def explain(bind, statement, params=None) -> dict:
+    """EXPLAIN a SQLAlchemy statement (with values for its bind params), return
+    the JSON plan"""
+    compiled = statement.compile(dialect=bind.dialect)
+    with bind.connect() as conn:
+        plan = conn.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", {**compiled.params, **(params or {})}
+        ).scalar()
+
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Tables read by a sequential scan anywhere in the plan"""
+    scans = []
+    if plan["Node Type"] == "Seq Scan":
+        scans.append(plan["Relation Name"])
+
+    for child in plan.get("Plans", []):
+        scans.extend(seq_scans(child))
+    return scans
+
+
+# ---------------------------------------------------------------------------- #
+#                                     Tests                                    #
+# ---------------------------------------------------------------------------- #
+
+# Bind params of the batched vote statements
+VOTES_BATCH = {"vote_post_ids": [123, 456], "vote_user_ids": [45, 67]}
+
+# Statements, or (statement, bind params) for those without inline values
+QUERIES = {
+    "post": lambda: posts_model.post_query(123),
+    "single_post": lambda: posts_model.single_post_query(123),
+    "posts_by_ids": lambda: posts_model.posts_by_ids_query([123, 4567, 8910]),
+    "all_posts": lambda: posts_model.all_posts_query(10, 0, ""),
+    "all_posts_deep_cursor": lambda: posts_model.all_posts_query(
+        10, 0, "", (datetime(2000, 1, 1, tzinfo=timezone.utc), 123)
+    ),
+    "all_posts_fulltext": lambda: posts_model.all_posts_query(
+        10, 0, "4242", mode=SearchMode.FULLTEXT
+    ),
+    "all_posts_summary": lambda: posts_model.all_posts_query(
+        10, 0, "", fields=posts_model.SUMMARY_FIELDS
+    ),
+    "bulk_delete_posts": lambda: posts_model.bulk_delete_posts_query(45, [123, 456]),
+    "update_post": lambda: posts_model.update_post_query(
+        123, 45, {"title": "title", "content": "content", "published": True}
+    ),
+    "delete_post": lambda: posts_model.delete_post_query(123, 45),
+    "vote_count": lambda: posts_model.vote_count_query(123, 1),
+    "user": lambda: users_model.user_query(123),
+    "user_by_email": lambda: users_model.user_by_email_query("user123@gmail.com"),
+    "rotate_refresh_token": lambda: users_model.rotate_refresh_token_query(
+        "0" * 64, "1" * 64
+    ),
+    "add_vote": lambda: votes_model.add_vote_query(123, 45),
+    "remove_vote": lambda: votes_model.remove_vote_query(123, 45),
+    "vote_state": lambda: votes_model.vote_state_query(123, 45),
+    "add_votes": lambda: (votes_model.add_votes_query(), VOTES_BATCH),
+    "remove_votes": lambda: (votes_model.remove_votes_query(), VOTES_BATCH),
+}
+
+
+@pytest.mark.parametrize("name", QUERIES)
+def test_query_uses_indexes(seeded_database, name):
+    """Test the query doesn't sequentially scan a large table"""
+    query = QUERIES[name]()
+    plan = explain(seeded_database, *(query if isinstance(query, tuple) else (query,)))
+    assert seq_scans(plan) == [], json.dumps(plan, indent=2)
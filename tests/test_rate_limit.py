@@ -0,0 +1,143 @@
+"""
+Test rate limiting and admission control
+"""
+
+# Imports
+import asyncio
+
+from fastapi import status
+
+from app.Utils.rate_limit import AdmissionControl, TokenBuckets, admission
+
+# ---------------------------------------------------------------------------- #
+#                                     Tests                                    #
+# ---------------------------------------------------------------------------- #
+
+
+def test_login_is_rate_limited_by_ip(client):
+    """Test logins past the route's burst get 429 with Retry-After"""
+    _, _, burst = admission.limits("/api/login")
+    data = {"username": "nobody@gmail.com", "password": "password123"}
+
+    for _ in range(burst):
+        response = client.post("/api/login", data=data)
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    response = client.post("/api/login", data=data)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+    assert int(response.headers["Retry-After"]) >= 1
+
+    # Other route groups have their own buckets
+    assert client.get("/api/posts/").status_code != status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def test_users_share_their_ip_bucket(authorized_client, test_user2, monkeypatch):
+    """Test authenticated requests are limited by IP as well as by user id"""
+    monkeypatch.setattr(admission, "routes", [("/api/vote", (1, 2))])
+    vote = {"post_id": 88888, "dir": 1}
+
+    for _ in range(2):
+        response = authorized_client.post("/api/vote/", json=vote)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+    response = authorized_client.post("/api/vote/", json=vote)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+    login = authorized_client.post(
+        "/api/login",
+        data={"username": test_user2["email"], "password": test_user2["password"]},
+    )
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    response = authorized_client.post("/api/vote/", json=vote, headers=headers)
+    assert response.status_code == status.HTTP_429_TOO_MANY_REQUESTS
+
+
+def test_requests_take_from_user_and_ip_buckets():
+    """Test a request is limited when either its user or its IP runs out"""
+    control = AdmissionControl(
+        rate=1,
+        burst=1,
+        routes={},
+        max_clients=10,
+        max_in_flight=0,
+        max_queue=0,
+        queue_timeout=0,
+        exempt=[],
+    )
+
+    assert control.take("/api/posts", [("ip", "a"), ("user", 1)]) == 0
+    # Same user from another IP
+    assert control.take("/api/posts", [("ip", "b"), ("user", 1)]) > 0
+    # Another user from the same IP
+    assert control.take("/api/posts", [("ip", "a"), ("user", 2)]) > 0
+    assert control.take("/api/posts", [("ip", "c")]) == 0
+    assert control.stats()["limited"] == 2
+
+
+def test_refused_requests_take_no_tokens():
+    """Test a request refused by one of its buckets leaves the others alone"""
+    control = AdmissionControl(
+        rate=0.001,
+        burst=1,
+        routes={},
+        max_clients=10,
+        max_in_flight=0,
+        max_queue=0,
+        queue_timeout=0,
+        exempt=[],
+    )
+
+    assert control.take("/api/posts", [("ip", "a"), ("user", 1)]) == 0
+    # A user over their limit from many IPs doesn't use up those IPs' buckets
+    for address, user in (("b", 2), ("c", 3)):
+        assert control.take("/api/posts", [("ip", address), ("user", 1)]) > 0
+        assert control.take("/api/posts", [("ip", address), ("user", user)]) == 0
+    assert control.stats()["limited"] == 2
+
+
+def test_buckets_are_bounded():
+    """Test the least recently seen clients are forgotten"""
+    buckets = TokenBuckets(max_keys=2)
+    for client in ("a", "b", "a", "c"):
+        buckets.take(client, rate=1, burst=1)
+
+    assert len(buckets) == 2
+    # "b" was forgotten, it starts again with a full bucket
+    assert buckets.take("b", rate=1, burst=1) == 0
+    assert buckets.take("c", rate=1, burst=1) > 0
+
+
+def test_requests_are_shed_past_the_in_flight_cap():
+    """Test requests past the cap wait for a slot within the timeout, or are shed"""
+    control = AdmissionControl(
+        rate=1,
+        burst=1,
+        routes={},
+        max_clients=10,
+        max_in_flight=1,
+        max_queue=1,
+        queue_timeout=0.01,
+        exempt=[],
+    )
+
+    async def scenario():
+        assert await control.admit()
+        # Queued, then timed out
+        assert not await control.admit()
+
+        control.max_queue = 0
+        # Queue full, shed right away
+        assert not await control.admit()
+
+        control.release()
+        assert await control.admit()
+
+    asyncio.run(scenario())
+    assert control.stats()["shed"] == 2
+    assert control.stats()["in_flight"] == 1
+
+
+def test_admission_metrics(internal_client):
+    """Test admission control metrics endpoint"""
+    response = internal_client.get("/api/internal/admission")
+    assert response.status_code == status.HTTP_200_OK
+    assert {"in_flight", "queued", "limited", "shed"} <= set(response.json())
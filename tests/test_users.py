@@ -1,11 +1,19 @@
 """
 Tests for out API application
 """
+import time
+import asyncio
+
 import pytest
+from sqlalchemy import text
 from jose import jwt
+from passlib.hash import bcrypt
 from pprint import pprint
-from fastapi import status
+from fastapi import HTTPException, status
 
+from app.Models import posts_model, users_model
+from app.Utils import bcrypt_calibration, crypt, oauth2
+from app.Utils.cache import MISSING
 from app.schemas.users_schema import UserResponse, AuthToken
 from app.settings.settings import Settings
 
@@ -36,6 +44,81 @@ def test_create_user(client):
     assert resp_user.email == EMAIL
 
 
+def test_get_user_not_modified(client, test_user):
+    """Test conditional GET of a user"""
+    response = client.get(f"/api/users/{test_user['id']}")
+    tag = response.headers["ETag"]
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.get(
+        f"/api/users/{test_user['id']}", headers={"If-None-Match": tag}
+    )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b""
+
+
+def test_current_user_is_cached(authorized_client, test_posts, count_statements):
+    """Test authenticated requests skip the user query once it is cached"""
+    path = f"/api/posts/{test_posts[0].id}"
+    authorized_client.get(path)
+    posts_model.posts_cache.clear()
+
+    # Post joined with its owner only
+    response = authorized_client.get(path)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["X-SQL-Statements"] == "1"
+
+
+def test_revocation_drops_cached_user(authorized_client, test_user):
+    """Test logging out everywhere drops the cached user"""
+    authorized_client.get("/api/posts/")
+    assert users_model.users_cache.get(test_user["id"]) is not MISSING
+
+    response = authorized_client.post("/api/logout/all")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert users_model.users_cache.get(test_user["id"]) is MISSING
+
+
+def test_sensitive_route_looks_user_up(authorized_client, test_user, session):
+    """Test deletes look the user up again, and a deleted user loses access"""
+    authorized_client.get("/api/posts/")
+
+    session.execute(text("DELETE FROM users WHERE id = :id"), {"id": test_user["id"]})
+    session.commit()
+
+    response = authorized_client.delete("/api/posts/1")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = authorized_client.get("/api/posts/")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_verified_token_is_cached(jwt_token, monkeypatch):
+    """Test a token is only decoded once"""
+    unauthorized = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    token_data = oauth2.verify_access_token(jwt_token, unauthorized)
+    hits = oauth2.tokens_cache.hits
+
+    monkeypatch.setattr(oauth2.jwt_backend, "decode", None)
+    assert oauth2.verify_access_token(jwt_token, unauthorized) == token_data
+    assert oauth2.tokens_cache.hits == hits + 1
+
+
+def test_cached_token_expires_with_token(session, monkeypatch):
+    """Test a cached token isn't trusted past its exp"""
+    token = jwt.encode(
+        {"user_id": 1, "exp": int(time.time()) + 30},
+        settings.JWT_SECRET_KEY,
+        algorithm=settings.JWT_ALOGORITHM,
+    )
+    unauthorized = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    oauth2.verify_access_token(token, unauthorized)
+
+    later = time.monotonic() + 31
+    monkeypatch.setattr("app.Utils.cache.time.monotonic", lambda: later)
+    assert oauth2.tokens_cache.get(oauth2.token_digest(token)) is MISSING
+
+
 def test_login_user(client, test_user):
     """Test user login feature [SUCCESS]"""
     response = client.post(
@@ -52,6 +135,49 @@ def test_login_user(client, test_user):
     assert token.token_type == "bearer"
 
 
+def test_refresh_token_rotation(client, test_user, count_statements):
+    """Test swapping a refresh token for new tokens, once"""
+    response = client.post(
+        "/api/login",
+        data={"username": test_user["email"], "password": test_user["password"]},
+    )
+    refresh_token = response.json()["refresh_token"]
+
+    response = client.post("/api/token/refresh", json={"refresh_token": refresh_token})
+    token = AuthToken(**response.json())
+    payload = jwt.decode(
+        token.access_token, settings.JWT_SECRET_KEY, algorithms=settings.JWT_ALOGORITHM
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert payload["user_id"] == test_user["id"]
+    assert token.refresh_token not in (None, refresh_token)
+    # One statement swaps the tokens
+    assert response.headers["X-SQL-Statements"] == "1"
+
+    response = client.post("/api/token/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.post(
+        "/api/token/refresh", json={"refresh_token": token.refresh_token}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+
+def test_refresh_token_expired(client, test_user, session):
+    """Test expired refresh tokens are refused"""
+    response = client.post(
+        "/api/login",
+        data={"username": test_user["email"], "password": test_user["password"]},
+    )
+    session.execute(text("UPDATE refresh_tokens SET expires_at = now()"))
+    session.commit()
+
+    response = client.post(
+        "/api/token/refresh", json={"refresh_token": response.json()["refresh_token"]}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
 @pytest.mark.parametrize(
     "email, password, status_code",
     [
@@ -73,3 +199,84 @@ def test_failed_login_user(client, email, password, status_code):
     )
     assert response.status_code == status_code
     # assert response.json()["detail"] == "Invalid Credentials"
+
+
+def test_login_rejected_when_hash_pool_is_full(client, test_user, monkeypatch):
+    """Test logins get 503 + Retry-After once the bcrypt pool and queue are full"""
+    hasher = crypt.password_hasher
+    monkeypatch.setattr(hasher, "in_flight", hasher.max_workers + hasher.queue_limit)
+
+    response = client.post(
+        "/api/login",
+        data={"username": test_user["email"], "password": test_user["password"]},
+    )
+    assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == str(hasher.retry_after)
+    assert hasher.stats()["rejected"] >= 1
+
+
+def test_cancelled_hash_counts_until_done():
+    """Test a call whose caller went away holds its slot until the pool is done"""
+    hasher = crypt.PasswordHasher(max_workers=1, queue_limit=0, retry_after=1)
+
+    async def cancel_call():
+        call = asyncio.create_task(hasher.run(time.sleep, 0.5))
+        await asyncio.sleep(0.2)  # running in the pool
+        call.cancel()
+        await asyncio.sleep(0)
+
+        with pytest.raises(HTTPException):
+            await hasher.run(time.sleep, 0)
+
+    try:
+        hasher.executor.submit(time.sleep, 0).result()  # pool process started
+        asyncio.run(cancel_call())
+        hasher.executor.submit(time.sleep, 0).result()  # after the cancelled call
+        assert hasher.in_flight == 0
+    finally:
+        hasher.shutdown()
+
+
+def test_password_hasher_metrics(internal_client):
+    """Test bcrypt pool metrics endpoint"""
+    response = internal_client.get("/api/internal/passwords")
+    assert response.status_code == status.HTTP_200_OK
+    assert {"running", "queued", "completed", "rejected"} <= set(response.json())
+
+
+def test_login_rehashes_password_of_other_cost(client, test_user, session):
+    """Test a stored hash of another bcrypt cost is replaced at login"""
+    session.execute(
+        text("UPDATE users SET password = :password WHERE id = :id"),
+        {
+            "password": bcrypt.using(rounds=4).hash(test_user["password"]),
+            "id": test_user["id"],
+        },
+    )
+    session.commit()
+
+    response = client.post(
+        "/api/login",
+        data={"username": test_user["email"], "password": test_user["password"]},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    password = session.execute(
+        text("SELECT password FROM users WHERE id = :id"), {"id": test_user["id"]}
+    ).scalar()
+    assert bcrypt.from_string(password).rounds == crypt.BCRYPT_ROUNDS
+    assert crypt.verify(test_user["password"], password)
+
+
+def test_calibrate_rounds():
+    """Test the highest cost within the budget is picked"""
+    # 50 ms at MIN_ROUNDS, doubling with every round
+    def measure(rounds):
+        return 50 * 2 ** (rounds - bcrypt_calibration.MIN_ROUNDS)
+
+    assert bcrypt_calibration.calibrate_rounds(250, measure) == 12
+    assert bcrypt_calibration.calibrate_rounds(1, measure) == bcrypt_calibration.MIN_ROUNDS
+    assert (
+        bcrypt_calibration.calibrate_rounds(10**9, measure)
+        == bcrypt_calibration.MAX_ROUNDS
+    )
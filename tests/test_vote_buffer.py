@@ -0,0 +1,187 @@
+"""
+Test write-behind vote buffering
+"""
+
+# Imports
+import asyncio
+
+import pytest
+from fastapi import HTTPException, status
+
+from app.Models import vote_buffer as vote_buffer_module
+from app.Models.vote_buffer import VoteBuffer
+from app.Routes import vote_routes
+from app.schemas import posts_schema, users_schema, votes_schema
+from tests import conftest
+
+# ---------------------------------------------------------------------------- #
+#                                   Fixtures                                   #
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.fixture
+def buffer(monkeypatch):
+    """Enabled vote buffer writing to the test database (flushed by the tests)"""
+    vote_buffer = VoteBuffer(
+        conftest.testing_async_session_local,
+        enabled=True,
+        flush_interval=60,
+        flush_max_entries=500,
+    )
+    monkeypatch.setattr(vote_routes, "vote_buffer", vote_buffer)
+    monkeypatch.setattr(vote_buffer_module, "vote_buffer", vote_buffer)
+    return vote_buffer
+
+
+# ---------------------------------------------------------------------------- #
+#                                     Tests                                    #
+# ---------------------------------------------------------------------------- #
+
+
+def test_vote_is_buffered_until_flushed(authorized_client, test_posts, session, buffer):
+    """Test a vote is acknowledged right away and written by the flush"""
+    post_id = test_posts[3].id
+    response = authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 1})
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json() == {"message": "Added Vote!"}
+    assert buffer.stats()["depth"] == 1
+    assert session.query(votes_schema.Vote).count() == 0
+
+    asyncio.run(buffer.flush())
+
+    assert buffer.stats()["depth"] == 0
+    assert buffer.stats()["flushed_votes"] == 1
+    assert session.query(votes_schema.Vote).count() == 1
+    session.expire_all()
+    assert session.get(posts_schema.Post, post_id).vote_count == 1
+
+
+def test_buffered_vote_conflicts(authorized_client, test_posts, buffer):
+    """Test already voted / not voted checks see buffered votes"""
+    post_id = test_posts[3].id
+    authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 1})
+
+    response = authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 1})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    response = authorized_client.post("/api/vote/", json={"post_id": test_posts[2].id, "dir": 0})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_buffer_keeps_last_direction(authorized_client, test_posts, session, buffer):
+    """Test a vote undone before the flush writes nothing"""
+    post_id = test_posts[3].id
+    authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 1})
+    response = authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 0})
+    assert response.json() == {"message": "Removed Vote!"}
+    assert buffer.stats()["depth"] == 1
+
+    asyncio.run(buffer.flush())
+
+    assert session.query(votes_schema.Vote).count() == 0
+    session.expire_all()
+    assert session.get(posts_schema.Post, post_id).vote_count == 0
+
+
+def test_buffered_down_vote(authorized_client, test_posts, session, buffer):
+    """Test removing a stored vote through the buffer"""
+    post_id = test_posts[3].id
+    authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 1})
+    asyncio.run(buffer.flush())
+
+    response = authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 0})
+    assert response.status_code == status.HTTP_201_CREATED
+    asyncio.run(buffer.flush())
+
+    assert session.query(votes_schema.Vote).count() == 0
+    session.expire_all()
+    assert session.get(posts_schema.Post, post_id).vote_count == 0
+
+
+def test_buffered_vote_on_missing_post(authorized_client, buffer):
+    """Test voting on a post which doesn't exist"""
+    response = authorized_client.post("/api/vote/", json={"post_id": 88888, "dir": 1})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert buffer.stats()["depth"] == 0
+
+
+def test_buffer_flushes_in_background(test_posts, test_user, session, buffer):
+    """Test the background flush runs when the buffer fills up, and stopping it
+    writes what is left"""
+    buffer.flush_max_entries = 2
+    user = users_schema.User(id=test_user["id"])
+
+    async def vote():
+        buffer.start()
+        async with conftest.testing_async_session_local() as database:
+            for post in test_posts[:2]:
+                vote_request = votes_schema.VoteRequest(post_id=post.id, dir=1)
+                await buffer.record(vote_request, database, user)
+            while not buffer.flushes:  # woken up before flush_interval
+                await asyncio.sleep(0.01)
+
+            vote_request = votes_schema.VoteRequest(post_id=test_posts[2].id, dir=1)
+            await buffer.record(vote_request, database, user)
+        await buffer.stop()
+
+    asyncio.run(asyncio.wait_for(vote(), 5))
+
+    assert buffer.stats()["flushes"] == 2
+    assert buffer.stats()["flushed_votes"] == 3
+    assert session.query(votes_schema.Vote).count() == 3
+
+
+def test_concurrent_identical_votes_conflict(test_posts, test_user, buffer):
+    """Test only one of two identical votes racing through the buffer is taken"""
+    user = users_schema.User(id=test_user["id"])
+    vote_request = votes_schema.VoteRequest(post_id=test_posts[3].id, dir=1)
+
+    async def vote():
+        async with conftest.testing_async_session_local() as database:
+            return await buffer.record(vote_request, database, user)
+
+    async def race():
+        return await asyncio.gather(vote(), vote(), return_exceptions=True)
+
+    results = asyncio.run(race())
+
+    errors = [result for result in results if isinstance(result, HTTPException)]
+    assert len(errors) == 1
+    assert errors[0].status_code == status.HTTP_409_CONFLICT
+    assert buffer.stats()["depth"] == 1
+
+
+def test_cancelled_flush_keeps_votes(buffer):
+    """Test a flush cancelled halfway puts its batch back in the buffer"""
+
+    class StalledSession:
+        """Session which never connects"""
+
+        async def __aenter__(self):
+            await asyncio.Event().wait()
+
+        async def __aexit__(self, *exc):
+            pass
+
+    buffer.session_factory = StalledSession
+    buffer.pending = {(1, 1): 1, (1, 2): 0}
+
+    async def cancel_flush():
+        flush = asyncio.create_task(buffer.flush())
+        await asyncio.sleep(0.01)
+        buffer.pending[(1, 2)] = 1  # recorded while flushing
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+
+    asyncio.run(cancel_flush())
+
+    assert buffer.pending == {(1, 1): 1, (1, 2): 1}
+    assert buffer.in_flight == {}
+
+
+def test_vote_buffer_metrics(internal_client):
+    """Test vote buffer metrics endpoint"""
+    response = internal_client.get("/api/internal/votes")
+    assert response.status_code == status.HTTP_200_OK
+    assert {"depth", "flushes", "flush_avg_ms", "flush_max_ms"} <= set(response.json())
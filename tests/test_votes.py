@@ -7,7 +7,9 @@ from pprint import pprint
 from fastapi import status
 import pytest
 
+from app.Models import votes_model
 from app.schemas import posts_schema, votes_schema
+from app.Utils.reconcile_vote_counts import reconcile_vote_counts
 
 # ---------------------------------------------------------------------------- #
 #                                   Fixtures                                   #
@@ -18,6 +20,7 @@ from app.schemas import posts_schema, votes_schema
 def test_vote(test_posts, session, test_user):
     new_vote = votes_schema.Vote(post_id=test_posts[3].id, user_id=test_user["id"])
     session.add(new_vote)
+    test_posts[3].vote_count += 1
     session.commit()
 
 
@@ -72,7 +75,64 @@ def test_vote_on_non_voted_post(authorized_client):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+def test_down_vote_on_non_existing_post(authorized_client):
+    """Test down voting a non existing post"""
+    response = authorized_client.post("/api/vote/", json={"post_id": 12321, "dir": 0})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == "Post does not exists!"
+
+
+@pytest.mark.parametrize("direction", [1, 0])
+def test_vote_statement_count(
+    authorized_client, test_posts, test_vote, count_statements, direction
+):
+    """Test adding or removing a vote takes a single statement"""
+    post_id = test_posts[2 if direction else 3].id
+    response = authorized_client.post(
+        "/api/vote/", json={"post_id": post_id, "dir": direction}
+    )
+    # Current user lookup + the vote
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.headers["X-SQL-Statements"] == "2"
+
+
+def test_repeated_vote_doesnt_conflict(session, test_posts, test_user):
+    """Test a vote racing an identical one is ignored instead of failing"""
+    query = votes_model.add_vote_query(test_posts[0].id, test_user["id"])
+
+    assert session.execute(query).scalar() == test_posts[0].id
+    assert session.execute(query).scalar() is None
+    session.commit()
+
+    session.expire_all()
+    assert test_posts[0].vote_count == 1
+
+
 def test_vote_unauthorized_user(client, test_posts):
     """Test voting a non exisitng post"""
     response = client.post("/api/vote/", json={"post_id": test_posts[3].id, "dir": 1})
     assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+def test_vote_count(authorized_client, test_posts):
+    """Test the vote count follows added and removed votes"""
+    post_id = test_posts[3].id
+
+    authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 1})
+    response = authorized_client.get(f"/api/posts/{post_id}")
+    assert response.json()["votes"] == 1
+
+    authorized_client.post("/api/vote/", json={"post_id": post_id, "dir": 0})
+    response = authorized_client.get(f"/api/posts/{post_id}")
+    assert response.json()["votes"] == 0
+
+
+def test_reconcile_vote_counts(session, test_posts, test_vote):
+    """Test drifted vote counts are repaired"""
+    test_posts[0].vote_count = 5
+    session.commit()
+
+    assert sorted(reconcile_vote_counts(session)) == [test_posts[0].id]
+    session.expire_all()
+    assert [post.vote_count for post in test_posts] == [0, 0, 0, 1]
+    assert reconcile_vote_counts(session) == []